@@ -0,0 +1,77 @@
+"""Backfill the transfer ledger with history from before it existed.
+
+The watcher only records transfers from the block it first started at, so
+credits for anything older are missing from the ledger. This scans the
+chain from --from-block (the JAXIM deploy block, or WATCHER_START_BLOCK)
+up to the watcher's checkpoint with the watcher's own code, records every
+transfer to the bot wallet (idempotently, keyed by tx hash and log index)
+and credits its sender, then recomputes every user's credits from the
+ledger. Old 1-JAXIM transfers don't trigger a wish again.
+
+Progress is checkpointed as "backfill", so an interrupted run resumes where
+it stopped and running it again only rechecks the credits.
+
+    python backfill_ledger.py --from-block 12345678
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+from config import get_config, ConfigError
+from db import get_checkpoint, set_checkpoint, recompute_credits, close_storage
+from executor import run_blocking, shutdown as shutdown_executor
+
+BACKFILL_CHECKPOINT = "backfill"
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Import pre-ledger JAXIM transfers into the ledger")
+    parser.add_argument("--from-block", type=int, default=os.getenv("WATCHER_START_BLOCK"),
+                        help="first block to scan (the JAXIM deploy block); defaults to WATCHER_START_BLOCK")
+    args = parser.parse_args(argv)
+    if args.from_block is None:
+        parser.error("--from-block is required when WATCHER_START_BLOCK is not set")
+    return args
+
+async def backfill(from_block):
+    # The watcher's scanning code; imported here so --help stays cheap
+    import bot
+
+    try:
+        # Everything after the watcher's checkpoint is the watcher's job. If it
+        # has never run, start it where the backfill ends so nothing falls
+        # between the two.
+        target = await run_blocking("db", get_checkpoint, bot.WATCHER_CHECKPOINT)
+        if target is None:
+            target = await bot.get_block_number()
+            await run_blocking("db", set_checkpoint, bot.WATCHER_CHECKPOINT, target)
+
+        last_block = await run_blocking("db", get_checkpoint, BACKFILL_CHECKPOINT)
+        last_block = from_block - 1 if last_block is None else max(last_block, from_block - 1)
+        if last_block < target:
+            print(f"🔎 Backfilling blocks {last_block + 1}-{target}")
+            last_block = await bot.scan_blocks(None, last_block, target, checkpoint=BACKFILL_CHECKPOINT)
+        users = await run_blocking("db", recompute_credits)
+    finally:
+        if bot._rpc_client is not None:
+            await bot._rpc_client.close()
+    return last_block, users
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        get_config()
+    except ConfigError as e:
+        raise SystemExit(f"❌ {e}")
+    started = time.perf_counter()
+    try:
+        last_block, users = asyncio.run(backfill(int(args.from_block)))
+    finally:
+        close_storage()
+        shutdown_executor()
+    print(f"📒 Ledger backfilled to block {last_block}, credits recomputed for {users} users "
+          f"in {time.perf_counter() - started:.2f}s")
+
+if __name__ == "__main__":
+    sys.exit(main())
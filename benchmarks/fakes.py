@@ -0,0 +1,313 @@
+import json
+import time
+import random
+import threading
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+
+# Local stand-ins for the services the bot talks to. Each one is a threaded
+# HTTP server on 127.0.0.1 that sleeps `latency` seconds per request before
+# answering, and counts the requests it served. A handler may return a
+# generator of bytes as the payload to stream the body as it's produced.
+
+class FakeService:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    # Seconds to wait before answering a request for `path`
+    def delay(self, path):
+        return self.latency
+
+    def handle(self, method, path, query, body, headers):
+        raise NotImplementedError
+
+    def start(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _serve(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                parsed = urlparse(self.path)
+                with service._lock:
+                    service.requests += 1
+                delay = service.delay(parsed.path)
+                if delay:
+                    time.sleep(delay)
+                status, payload, content_type = service.handle(
+                    self.command, parsed.path, parse_qs(parsed.query), body, self.headers
+                )
+                if hasattr(payload, "__next__"):
+                    # No Content-Length: the body ends when the connection closes
+                    self.send_response(status)
+                    self.send_header("Content-Type", content_type)
+                    self.end_headers()
+                    for chunk in payload:
+                        self.wfile.write(chunk)
+                        self.wfile.flush()
+                    self.close_connection = True
+                    return
+                data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = _serve
+            do_POST = _serve
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+def parse_form(body, headers):
+    content_type = headers.get("Content-Type", "")
+    if "application/json" in content_type:
+        return json.loads(body or b"{}")
+    if "multipart/form-data" in content_type:
+        message = BytesParser(policy=default_policy).parsebytes(
+            b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body
+        )
+        fields = {}
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            if part.get_filename() is None:
+                fields[name] = part.get_content().strip()
+        return fields
+    return {k: v[0] for k, v in parse_qs(body.decode()).items()}
+
+# Telegram Bot API (/bot<token>/<method>)
+class FakeTelegram(FakeService):
+    def __init__(self, latency=0.03):
+        super().__init__(latency)
+        self._message_id = 0
+        self.sent = []
+        # (time.perf_counter(), chat_id) of every editMessageText
+        self.edits = []
+
+    def _message(self, chat_id, **extra):
+        with self._lock:
+            self._message_id += 1
+            message_id = self._message_id
+        message = {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id), "type": "private" if int(chat_id) > 0 else "group"},
+        }
+        message.update(extra)
+        return message
+
+    def handle(self, method, path, query, body, headers):
+        api_method = path.rsplit("/", 1)[-1]
+        params = parse_form(body, headers)
+        chat_id = params.get("chat_id", 0)
+        file_id = f"file-{api_method}-{random.getrandbits(32):x}"
+
+        if api_method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Jaxim Jeanie", "username": "jaxim_bench_bot",
+                      "can_join_groups": True, "can_read_all_group_messages": False,
+                      "supports_inline_queries": False}
+        elif api_method == "getChat":
+            result = {"id": int(chat_id), "type": "private", "first_name": f"User{chat_id}",
+                      "username": f"user{chat_id}", "accent_color_id": 0, "max_reaction_count": 11}
+        elif api_method in ("sendMessage", "editMessageText"):
+            result = self._message(chat_id, text=params.get("text", ""))
+        elif api_method == "sendAnimation":
+            result = self._message(chat_id, animation={
+                "file_id": file_id, "file_unique_id": file_id, "width": 320, "height": 320, "duration": 3
+            })
+        elif api_method == "sendPhoto":
+            result = self._message(chat_id, photo=[{
+                "file_id": file_id, "file_unique_id": file_id, "width": 640, "height": 640
+            }])
+        else:
+            result = True
+
+        with self._lock:
+            self.sent.append(api_method)
+            if api_method == "editMessageText":
+                self.edits.append((time.perf_counter(), int(chat_id)))
+        return 200, {"ok": True, "result": result}, "application/json"
+
+# Covalent transfers_v2: every wallet has `transfers_per_wallet` transfers of
+# one JAXIM to the bot wallet, split over pages of `page_size`
+class FakeCovalent(FakeService):
+    def __init__(self, bot_wallet, latency=0.3, transfers_per_wallet=5, page_size=100):
+        super().__init__(latency)
+        self.bot_wallet = bot_wallet.lower()
+        self.transfers_per_wallet = transfers_per_wallet
+        self.page_size = page_size
+
+    def handle(self, method, path, query, body, headers):
+        parts = path.strip("/").split("/")
+        wallet = parts[parts.index("address") + 1].lower()
+        page = int(query.get("page-number", ["0"])[0])
+        start = page * self.page_size
+        end = min(start + self.page_size, self.transfers_per_wallet)
+        items = [
+            {
+                "tx_hash": f"0x{i:064x}",
+                "transfers": [{
+                    "from_address": wallet,
+                    "to_address": self.bot_wallet,
+                    "delta": str(10 ** 18),
+                    "contract_decimals": 18,
+                }],
+            }
+            for i in range(start, end)
+        ]
+        data = {
+            "items": items,
+            "pagination": {"has_more": end < self.transfers_per_wallet, "page_number": page,
+                           "page_size": self.page_size},
+        }
+        return 200, {"data": data, "error": False}, "application/json"
+
+# Base JSON-RPC: eth_blockNumber plus eth_getLogs returning `logs_per_block`
+# one-JAXIM transfers to the bot wallet per block, from `senders` in turn.
+# Ranges wider than `max_range` are rejected like a real provider would.
+class FakeRpc(FakeService):
+    def __init__(self, bot_wallet, senders, head=1_000_000, latency=0.05, logs_per_block=1, max_range=10_000):
+        super().__init__(latency)
+        self.bot_wallet = bot_wallet.lower()
+        self.senders = [s.lower() for s in senders]
+        self.head = head
+        self.logs_per_block = logs_per_block
+        self.max_range = max_range
+
+    def _logs(self, params):
+        from_block = int(params["fromBlock"], 16) if isinstance(params["fromBlock"], str) else params["fromBlock"]
+        to_block = params["toBlock"]
+        to_block = self.head if to_block == "latest" else int(to_block, 16) if isinstance(to_block, str) else to_block
+        if to_block - from_block + 1 > self.max_range:
+            raise ValueError(f"block range too large (max {self.max_range})")
+        logs = []
+        for block in range(from_block, min(to_block, self.head) + 1):
+            for i in range(self.logs_per_block):
+                sender = self.senders[(block * self.logs_per_block + i) % len(self.senders)]
+                logs.append({
+                    "address": params.get("address"),
+                    "blockHash": f"0x{block:064x}",
+                    "blockNumber": hex(block),
+                    "data": hex(10 ** 18),
+                    "logIndex": hex(i),
+                    "removed": False,
+                    "topics": [
+                        TRANSFER_TOPIC,
+                        "0x" + sender[2:].rjust(64, "0"),
+                        "0x" + self.bot_wallet[2:].rjust(64, "0"),
+                    ],
+                    "transactionHash": f"0x{block:056x}{i:08x}",
+                    "transactionIndex": hex(i),
+                })
+        return logs
+
+    def _call(self, request):
+        method = request.get("method")
+        try:
+            if method == "eth_blockNumber":
+                result = hex(self.head)
+            elif method == "eth_chainId":
+                result = hex(8453)
+            elif method == "eth_getLogs":
+                result = self._logs(request["params"][0])
+            else:
+                return {"jsonrpc": "2.0", "id": request.get("id"),
+                        "error": {"code": -32601, "message": f"method {method} not found"}}
+        except ValueError as e:
+            return {"jsonrpc": "2.0", "id": request.get("id"), "error": {"code": -32005, "message": str(e)}}
+        return {"jsonrpc": "2.0", "id": request.get("id"), "result": result}
+
+    def handle(self, method, path, query, body, headers):
+        request = json.loads(body)
+        if isinstance(request, list):
+            return 200, [self._call(r) for r in request], "application/json"
+        return 200, self._call(request), "application/json"
+
+# Gemini generateContent (REST). Replies with a JSON array of unique quotes,
+# as many as the prompt asks for. streamGenerateContent streams one quote as
+# a JSON array of responses, `stream_chunks` pieces of it: the first after
+# `first_chunk_latency` seconds, the rest spread over the remaining `latency`.
+class FakeGemini(FakeService):
+    def __init__(self, latency=1.5, first_chunk_latency=0.3, stream_chunks=8):
+        super().__init__(latency)
+        self.first_chunk_latency = min(first_chunk_latency, latency)
+        self.stream_chunks = stream_chunks
+        self._counter = 0
+
+    @staticmethod
+    def _streaming(path):
+        return path.endswith(":streamGenerateContent")
+
+    def delay(self, path):
+        return self.first_chunk_latency if self._streaming(path) else self.latency
+
+    def _stream(self, quote):
+        words = quote.split(" ")
+        size = max(1, -(-len(words) // self.stream_chunks))
+        pieces = [" ".join(words[i:i + size]) + " " for i in range(0, len(words), size)]
+        pieces[-1] = pieces[-1].rstrip()
+        interval = (self.latency - self.first_chunk_latency) / max(len(pieces) - 1, 1)
+        for i, piece in enumerate(pieces):
+            if i:
+                time.sleep(interval)
+            candidate = {"content": {"role": "model", "parts": [{"text": piece}]}, "index": 0}
+            if i == len(pieces) - 1:
+                candidate["finishReason"] = "STOP"
+            yield (b"[" if i == 0 else b",\r\n") + json.dumps({"candidates": [candidate]}).encode()
+        yield b"]"
+
+    def _quotes(self, prompt):
+        words = prompt.split()
+        n = 1
+        for i, word in enumerate(words):
+            if word == "me" and i + 1 < len(words) and words[i + 1].isdigit():
+                n = int(words[i + 1])
+        quotes = []
+        for _ in range(n):
+            with self._lock:
+                self._counter += 1
+                counter = self._counter
+            quotes.append(
+                f"Benchmark wish number {counter} sparkles {random.getrandbits(48):x} into being. "
+                f"Believe in batch {counter % 97} and the lamp will glow."
+            )
+        return quotes
+
+    def handle(self, method, path, query, body, headers):
+        request = json.loads(body or b"{}")
+        prompt = " ".join(
+            part.get("text", "")
+            for content in request.get("contents", [])
+            for part in content.get("parts", [])
+        )
+        if self._streaming(path):
+            return 200, self._stream(self._quotes(prompt)[0]), "application/json"
+        candidate = {
+            "content": {"role": "model", "parts": [{"text": json.dumps(self._quotes(prompt))}]},
+            "finishReason": "STOP",
+            "index": 0,
+        }
+        return 200, {"candidates": [candidate]}, "application/json"
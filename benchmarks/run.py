@@ -0,0 +1,320 @@
+"""Offline end-to-end benchmark for the bot.
+
+Starts local stand-ins for the Telegram Bot API, Covalent, the Base JSON-RPC
+and Gemini (benchmarks/fakes.py), points bot.py at them through its env
+variables, and drives scripted users through the real command handlers via
+Application.process_update. Besides per-command latency it reports the
+time from each /wish to the first edit of its message (a buffered quote, or
+the first streamed chunk). It then replays a block range through the
+transfer watcher to measure catch-up speed.
+
+Storage is a throwaway SQLite database in a temporary directory. With
+--storage mysql it is instead a throwaway MySQL database (jaxim_bench_<pid>)
+created on the server given by BENCH_MYSQL_HOST/PORT/USER/PASSWORD (falling
+back to the MYSQL_* variables) and dropped afterwards.
+
+    python -m benchmarks.run --users 50 --rounds 3 --output bench.json
+    python -m benchmarks.run --baseline bench.json   # compare with a previous run
+"""
+import os
+import sys
+import json
+import math
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+from benchmarks.fakes import FakeTelegram, FakeCovalent, FakeRpc, FakeGemini
+
+BOT_WALLET = "0x" + "b0" * 20
+COMMANDS = ["balance", "wish", "wishcount", "leaderboard", "howto"]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark for Jaxim Jeanie")
+    parser.add_argument("--users", type=int, default=50, help="concurrent scripted users")
+    parser.add_argument("--rounds", type=int, default=3, help="times each user runs the command script")
+    parser.add_argument("--commands", default=",".join(COMMANDS), help="comma-separated command script")
+    parser.add_argument("--credits", type=int, default=10, help="wish credits seeded per user")
+    parser.add_argument("--telegram-latency", type=float, default=0.03)
+    parser.add_argument("--covalent-latency", type=float, default=0.3)
+    parser.add_argument("--rpc-latency", type=float, default=0.05)
+    parser.add_argument("--gemini-latency", type=float, default=1.5)
+    parser.add_argument("--gemini-first-chunk-latency", type=float, default=0.3,
+                        help="seconds before a streamed quote's first chunk")
+    parser.add_argument("--catchup-blocks", type=int, default=5000, help="blocks replayed through the watcher")
+    parser.add_argument("--logs-per-block", type=int, default=1)
+    parser.add_argument("--storage", choices=["sqlite", "mysql"], default="sqlite")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="previous results file to compare against")
+    return parser.parse_args(argv)
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = min(len(ordered), max(1, math.ceil(pct / 100 * len(ordered))))
+    return ordered[rank - 1]
+
+def summarize(latencies, errors):
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else None,
+        "p50_ms": percentile(latencies, 50) * 1000 if latencies else None,
+        "p95_ms": percentile(latencies, 95) * 1000 if latencies else None,
+        "p99_ms": percentile(latencies, 99) * 1000 if latencies else None,
+        "max_ms": max(latencies) * 1000 if latencies else None,
+    }
+
+# === Throwaway store ===
+
+def mysql_settings():
+    return {
+        "host": os.getenv("BENCH_MYSQL_HOST", os.getenv("MYSQL_HOST", "127.0.0.1")),
+        "port": int(os.getenv("BENCH_MYSQL_PORT", os.getenv("MYSQL_PORT", "3306"))),
+        "user": os.getenv("BENCH_MYSQL_USER", os.getenv("MYSQL_USER", "root")),
+        "password": os.getenv("BENCH_MYSQL_PASSWORD", os.getenv("MYSQL_PASSWORD", "")),
+    }
+
+def create_store(storage, workdir):
+    if storage == "sqlite":
+        os.environ.update({
+            "STORAGE_BACKEND": "sqlite",
+            "SQLITE_PATH": os.path.join(workdir, "bench.db"),
+        })
+        return None
+
+    import mysql.connector
+
+    settings = mysql_settings()
+    name = f"jaxim_bench_{os.getpid()}"
+    conn = mysql.connector.connect(**settings)
+    conn.cursor().execute(f"CREATE DATABASE {name}")
+    conn.close()
+    os.environ.update({
+        "MYSQL_HOST": settings["host"],
+        "MYSQL_PORT": str(settings["port"]),
+        "MYSQL_USER": settings["user"],
+        "MYSQL_PASSWORD": settings["password"],
+        "MYSQL_DB": name,
+        "STORAGE_BACKEND": "mysql",
+    })
+    return name
+
+def drop_store(name):
+    if name is None:
+        return
+    import mysql.connector
+
+    conn = mysql.connector.connect(**mysql_settings())
+    conn.cursor().execute(f"DROP DATABASE IF EXISTS {name}")
+    conn.close()
+
+# === Scripted load ===
+
+def make_update(bot, update_id, user_id, command):
+    from telegram import Update
+
+    text = f"/{command}"
+    return Update.de_json({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"},
+            "text": text,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(text)}],
+        },
+    }, bot)
+
+async def seed_users(wallets, credits):
+    from db import add_user, record_transfer, CREDIT_UNIT
+
+    for user_id, wallet in wallets.items():
+        add_user(user_id, wallet)
+        record_transfer(f"0x{user_id:064x}", 0, wallet, credits * CREDIT_UNIT, 0)
+
+# Time from each /wish update to the first edit of its message (the first
+# text the user sees after the placeholder), from the edits FakeTelegram saw
+def first_edit_latencies(wishes, edits):
+    edits_by_chat = {}
+    for at, chat_id in edits:
+        edits_by_chat.setdefault(chat_id, []).append(at)
+    latencies = []
+    missing = 0
+    for chat_id, started, finished in wishes:
+        seen = [at for at in edits_by_chat.get(chat_id, ()) if started <= at <= finished]
+        if seen:
+            latencies.append(min(seen) - started)
+        else:
+            missing += 1
+    return summarize(latencies, missing)
+
+async def run_commands(app, telegram, users, rounds, commands):
+    latencies = {command: [] for command in commands}
+    errors = {command: 0 for command in commands}
+    counter = iter(range(1, 10 ** 9))
+    # (chat_id, started, finished) of every /wish
+    wishes = []
+
+    async def session(user_id):
+        for _ in range(rounds):
+            for command in commands:
+                update = make_update(app.bot, next(counter), user_id, command)
+                started = time.perf_counter()
+                try:
+                    await app.process_update(update)
+                except Exception:
+                    errors[command] += 1
+                finished = time.perf_counter()
+                latencies[command].append(finished - started)
+                if command == "wish":
+                    wishes.append((user_id, started, finished))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(session(user_id) for user_id in users))
+    wall = time.perf_counter() - started
+
+    total = sum(len(v) for v in latencies.values())
+    return {
+        "commands": {command: summarize(latencies[command], errors[command]) for command in commands},
+        # Wishes that never got an edit (failures) count as errors
+        "wish_first_edit": first_edit_latencies(wishes, telegram.edits),
+        "overall": {
+            "updates": total,
+            "wall_seconds": wall,
+            "updates_per_second": total / wall if wall else None,
+            "latency": summarize([x for v in latencies.values() for x in v], sum(errors.values())),
+        },
+    }
+
+async def run_catchup(bot_module, app, rpc, blocks):
+    from executor import run_blocking
+    from db import set_checkpoint
+    from dispatcher import dispatcher
+
+    start_block = rpc.head - blocks
+    await run_blocking("db", set_checkpoint, bot_module.WATCHER_CHECKPOINT, start_block)
+    rpc_requests = rpc.requests
+
+    started = time.perf_counter()
+    await bot_module.scan_blocks(app, start_block, rpc.head)
+    scanned = time.perf_counter() - started
+
+    # Notifications are only enqueued during the scan; time how long they take to go out
+    while dispatcher.queue_depth():
+        await asyncio.sleep(0.05)
+    drained = time.perf_counter() - started
+
+    events = blocks * rpc.logs_per_block
+    return {
+        "blocks": blocks,
+        "events": events,
+        "scan_seconds": scanned,
+        "blocks_per_second": blocks / scanned if scanned else None,
+        "events_per_second": events / scanned if scanned else None,
+        "notifications_drained_seconds": drained,
+        "rpc_requests": rpc.requests - rpc_requests,
+    }
+
+async def run_benchmark(args, fakes, wallets):
+    import bot as bot_module
+
+    app = bot_module.build_application()
+    bot_module.register_handlers(app)
+    await app.initialize()
+    await bot_module.start_background_tasks(app)
+    try:
+        await seed_users(wallets, args.credits)
+        commands = [c.strip() for c in args.commands.split(",") if c.strip()]
+        results = await run_commands(app, fakes["telegram"], list(wallets), args.rounds, commands)
+        results["watcher"] = await run_catchup(bot_module, app, fakes["rpc"], args.catchup_blocks)
+    finally:
+        await bot_module.stop_background_tasks(app)
+        await app.shutdown()
+    results["upstream_requests"] = {name: fake.requests for name, fake in fakes.items()}
+    return results
+
+def print_report(results, baseline=None):
+    print(f"\n{'command':<12}{'count':>7}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'Δp95':>9}")
+    for command, stats in results["commands"].items():
+        delta = ""
+        old = (baseline or {}).get("commands", {}).get(command)
+        if old and old.get("p95_ms") and stats["p95_ms"]:
+            delta = f"{(stats['p95_ms'] / old['p95_ms'] - 1) * 100:+.0f}%"
+        print(f"{command:<12}{stats['count']:>7}{stats['errors']:>5}"
+              f"{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}{delta:>9}")
+    first_edit = results["wish_first_edit"]
+    if first_edit["count"]:
+        delta = ""
+        old = (baseline or {}).get("wish_first_edit")
+        if old and old.get("p95_ms"):
+            delta = f" ({(first_edit['p95_ms'] / old['p95_ms'] - 1) * 100:+.0f}% p95)"
+        print(f"\n✏️ /wish first edit: p50 {first_edit['p50_ms']:.1f} ms, p95 {first_edit['p95_ms']:.1f} ms, "
+              f"p99 {first_edit['p99_ms']:.1f} ms{delta}, {first_edit['errors']} without an edit")
+    overall = results["overall"]
+    print(f"\n⚡ {overall['updates']} updates in {overall['wall_seconds']:.2f}s "
+          f"({overall['updates_per_second']:.1f}/s)")
+    watcher = results["watcher"]
+    print(f"🔭 Watcher caught up {watcher['blocks']} blocks / {watcher['events']} events in "
+          f"{watcher['scan_seconds']:.2f}s ({watcher['events_per_second']:.0f} events/s, "
+          f"{watcher['rpc_requests']} RPC requests), notifications drained in "
+          f"{watcher['notifications_drained_seconds']:.2f}s")
+    print(f"📡 Upstream requests: {results['upstream_requests']}")
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix="jaxim-bench-")
+
+    wallets = {100000 + i: f"0x{i + 1:040x}" for i in range(args.users)}
+    fakes = {
+        "telegram": FakeTelegram(latency=args.telegram_latency).start(),
+        "covalent": FakeCovalent(BOT_WALLET, latency=args.covalent_latency).start(),
+        "rpc": FakeRpc(BOT_WALLET, list(wallets.values()), latency=args.rpc_latency,
+                       logs_per_block=args.logs_per_block).start(),
+        "gemini": FakeGemini(latency=args.gemini_latency,
+                             first_chunk_latency=args.gemini_first_chunk_latency).start(),
+    }
+    os.environ.update({
+        "BOT_TOKEN": "123456:bench",
+        "BOT_WALLET": BOT_WALLET,
+        "BASE_RPC": fakes["rpc"].url,
+        "TELEGRAM_BASE_URL": fakes["telegram"].url + "/bot",
+        "COVALENT_BASE_URL": fakes["covalent"].url + "/v1",
+        "COVALENT_API_KEY": "bench",
+        "QUOTE_BACKEND": "gemini",
+        "GEMINI_API_KEY": "bench",
+        "GEMINI_API_ENDPOINT": fakes["gemini"].url,
+        "USED_QUOTES_FILE": os.path.join(workdir, "used_quotes.txt"),
+        "QUOTE_BUFFER_FILE": os.path.join(workdir, "quote_buffer.json"),
+        "MEDIA_CACHE_FILE": os.path.join(workdir, "media_cache.json"),
+        "WATCHER_ENABLED": "0",
+    })
+
+    store = create_store(args.storage, workdir)
+    try:
+        from db import init_db
+        init_db()
+        results = asyncio.run(run_benchmark(args, fakes, wallets))
+    finally:
+        drop_store(store)
+        for fake in fakes.values():
+            fake.stop()
+
+    results["config"] = vars(args)
+    results["timestamp"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+    print(f"\n📝 Results written to {args.output}")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,66 +1,104 @@
+import metrics  # first: loads .env (through config) and starts the startup clock
 import os
 import asyncio
-import requests
 from telegram.constants import ParseMode
 from telegram.ext import ContextTypes
 from telegram import Update
 from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes
 from telegram.ext import ChatMemberHandler
 from telegram import InputFile
-from web3 import Web3
-from dotenv import load_dotenv
-from quotes import get_ai_quote
+from config import get_config, env_float, ConfigError, JAXIM_CONTRACT
+from quote_buffer import quote_buffer
+from quote_stream import deliver_quote, start_quote_delivery
+from executor import run_blocking, shutdown as shutdown_executor
+from cache import TTLCache
+from media import media_registry
+from dispatcher import dispatcher
+from update_processor import PerUserUpdateProcessor
+from leader import get_leader_lock
+from rpc import RpcClient, RpcError
+from metrics import instrument_handler
 from db import (
     init_db,
+    close_storage,
     add_user,
     get_wallet,
-    get_all_users,
     get_wish_count,
-    increment_wish_count,
-    get_leaderboard
+    spend_credit,
+    get_credit_balance,
+    CREDIT_UNIT,
+    get_leaderboard,
+    get_leaderboard_version,
+    record_transfer,
+    get_checkpoint,
+    set_checkpoint
 )
 
-# Load environment variables
-load_dotenv()
-
-# ENV variables
-BOT_TOKEN = os.getenv("BOT_TOKEN")
-BASE_RPC = os.getenv("BASE_RPC")
-JAXIM_CONTRACT = "0x082Ef77013B51f4a808e83a4d345cdc88cFdd9c4"
-BOT_WALLET = os.getenv("BOT_WALLET").lower()
-COVALENT_API_KEY = os.getenv("COVALENT_API_KEY")
-COVALENT_BASE_URL = "https://api.covalenthq.com/v1"
-CHAIN_NAME = "base-mainnet"
-
-# Web3 connection
-web3 = Web3(Web3.HTTPProvider(BASE_RPC))
-
-app = ApplicationBuilder().token(BOT_TOKEN).build()
-
-# JAXIM ABI (simplified)
-ABI = [
-    {
-        "constant": True,
-        "inputs": [{"name": "_owner", "type": "address"}],
-        "name": "balanceOf",
-        "outputs": [{"name": "balance", "type": "uint256"}],
-        "payable": False,
-        "stateMutability": "view",
-        "type": "function"
-    },
-    {
-        "anonymous": False,
-        "inputs": [
-            {"indexed": True, "name": "from", "type": "address"},
-            {"indexed": True, "name": "to", "type": "address"},
-            {"indexed": False, "name": "value", "type": "uint256"}
-        ],
-        "name": "Transfer",
-        "type": "event"
-    }
-]
-
-contract = web3.eth.contract(address=Web3.to_checksum_address(JAXIM_CONTRACT), abi=ABI)
+LEADERBOARD_TTL = env_float("LEADERBOARD_TTL", "60")
+DISPLAY_NAME_TTL = env_float("DISPLAY_NAME_TTL", "3600")
+
+# Welcome animation for /start; set WELCOME_MEDIA=video to send the smaller MP4
+WELCOME_MEDIA = {
+    "gif": "assets/jaxim-welcome.gif",
+    "video": "assets/jaxim-welcome.mp4",
+}.get(os.getenv("WELCOME_MEDIA", "gif"), "assets/jaxim-welcome.gif")
+WELCOME_PHOTO = "assets/jaxim.jpg"
+
+_rpc_client = None
+
+# Base RPC client over every endpoint in BASE_RPC, created on first use
+def get_rpc_client():
+    global _rpc_client
+    if _rpc_client is None:
+        _rpc_client = RpcClient(get_config().rpc_urls)
+    return _rpc_client
+
+# Long-running tasks started with the Application, on its event loop
+background_tasks = []
+# Leader lock of the transfer watcher, taken once the Application starts
+watcher_lock = None
+
+async def start_background_tasks(application):
+    global watcher_lock
+    metrics.start_metrics_server()
+    background_tasks.extend([
+        asyncio.create_task(dispatcher.run()),
+        asyncio.create_task(quote_buffer.run()),
+    ])
+    if get_config().watcher_enabled:
+        watcher_lock = get_leader_lock("jaxim_transfer_watcher")
+        background_tasks.append(asyncio.create_task(watch_transfers(application, watcher_lock)))
+    metrics.startup_phase("app_init")
+    metrics.startup_report()
+
+async def stop_background_tasks(application):
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+    # Hand the watcher to another node right away instead of after the lease
+    if watcher_lock is not None:
+        await run_blocking("db", watcher_lock.release)
+    await run_blocking("db", close_storage)
+    if _rpc_client is not None:
+        await _rpc_client.close()
+    shutdown_executor()
+
+def build_application():
+    config = get_config()
+    update_processor = PerUserUpdateProcessor()
+    metrics.register(metrics.Gauge(
+        "jaxim_active_user_locks", "Users with an update running or queued", callback=update_processor.active_users))
+    builder = (
+        ApplicationBuilder()
+        .token(config.bot_token)
+        .concurrent_updates(update_processor)
+        .post_init(start_background_tasks)
+        .post_shutdown(stop_background_tasks)
+    )
+    if config.telegram_base_url:
+        builder = builder.base_url(config.telegram_base_url)
+    return builder.build()
 
 # === Telegram Bot Handlers ===
 
@@ -70,37 +108,37 @@ async def welcome_on_added(update: Update, context: ContextTypes.DEFAULT_TYPE):
         new_status = update.my_chat_member.new_chat_member.status
         print(f"[DEBUG] old_status: {old_status}, new_status: {new_status}")
         if old_status in ["kicked", "left"] and new_status in ["member", "administrator"]:
-            photo_path = "assets/jaxim.jpg"  # Adjust this path if needed
-
-            if not os.path.exists(photo_path):
-                await context.bot.send_message(
+            try:
+                await dispatcher.call(update.effective_chat.id, lambda: media_registry.send(
+                    WELCOME_PHOTO,
+                    lambda photo: context.bot.send_photo(
+                        chat_id=update.effective_chat.id,
+                        photo=photo if isinstance(photo, str) else InputFile(photo),
+                        caption=(
+                            "🧞‍♂️ *Jaxim Jeanie has arrived!*\n\n"
+                            "Thanks for summoning me into this group!\n"
+                            "Send me JAXIM tokens to receive your wish!"
+                        ),
+                        parse_mode=ParseMode.MARKDOWN
+                    ),
+                    lambda message: message.photo[-1].file_id
+                ))
+            except FileNotFoundError:
+                await dispatcher.send_message(
+                    context.bot,
                     chat_id=update.effective_chat.id,
                     text="👋 Welcome! (Image not found)"
                 )
-                return
-
-            with open(photo_path, "rb") as photo:
-                await context.bot.send_photo(
-                    chat_id=update.effective_chat.id,
-                    photo=InputFile(photo),
-                    caption=(
-                        "🧞‍♂️ *Jaxim Jeanie has arrived!*\n\n"
-                        "Thanks for summoning me into this group!\n"
-                        "Send me JAXIM tokens to receive your wish!"
-                    ),
-                    parse_mode=ParseMode.MARKDOWN
-                )
     except Exception as e:
         print(f"Error in welcome_on_added: {e}")
 
-app.add_handler(ChatMemberHandler(welcome_on_added, chat_member_types=["my_chat_member"]))
-
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        with open("assets/jaxim-welcome.gif", "rb") as gif:
-            await context.bot.send_animation(
+        await dispatcher.call(update.effective_chat.id, lambda: media_registry.send(
+            WELCOME_MEDIA,
+            lambda animation: context.bot.send_animation(
                 chat_id=update.effective_chat.id,
-                animation=gif,
+                animation=animation,
                 caption=(
                     "🗞️‍♀️ *Welcome to Jaxim Jeanie!*\n\n"
                     "I'm your friendly genie of the blockchain. To begin, register your wallet:\n"
@@ -110,19 +148,22 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     "Need help? Use `/howto` for a full guide."
                 ),
                 parse_mode=ParseMode.MARKDOWN
-            )
+            ),
+            lambda message: (message.animation or message.document).file_id
+        ))
     except Exception as e:
         print("⚠️ Error sending animation:", e)
 
 async def howto(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await context.bot.send_message(
+    await dispatcher.send_message(
+        context.bot,
         chat_id=update.effective_chat.id,
         text=(
             "📘 *How to use Jaxim Jeanie*\n\n"
             "Here's what you can do:\n\n"
             "1️⃣ `/register <your_wallet_address>` — Register your wallet address with the bot.\n"
             "2️⃣ *Send JAXIM tokens* to this bot wallet address:\n"
-            f"`{BOT_WALLET}`\n"
+            f"`{get_config().bot_wallet}`\n"
             "   Each token you send gives you 1 wish credit.\n"
             "3️⃣ `/balance` — Check how many wish credits you have (tokens sent minus wishes used).\n"
             "4️⃣ `/wish` — Spend a wish credit to receive a magical quote from Jeanie.\n"
@@ -139,7 +180,8 @@ async def register(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
 
     if len(context.args) != 1:
-        await context.bot.send_message(
+        await dispatcher.send_message(
+            context.bot,
             chat_id=chat_id,
             text="❗ *Usage:* `/register <your_wallet_address>`",
             parse_mode="Markdown"
@@ -147,64 +189,65 @@ async def register(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     wallet = context.args[0]
-    if not web3.is_address(wallet):
-        await context.bot.send_message(
+    # web3 is only needed here; keep it off the startup path
+    from web3 import Web3
+
+    if not Web3.is_address(wallet):
+        await dispatcher.send_message(
+            context.bot,
             chat_id=chat_id,
             text="❗ *Invalid wallet address.*",
             parse_mode="Markdown"
         )
         return
 
-    current_wallet = get_wallet(user_id)
+    current_wallet = await run_blocking("db", get_wallet, user_id)
     if current_wallet:
         if current_wallet.lower() == wallet.lower():
-            await context.bot.send_message(
+            await dispatcher.send_message(
+                context.bot,
                 chat_id=chat_id,
                 text=f"⚠️ *You have already registered this wallet!*\n\n`{wallet}`",
                 parse_mode="Markdown"
             )
             return
         else:
-            await context.bot.send_message(
+            await dispatcher.send_message(
+                context.bot,
                 chat_id=chat_id,
                 text=f"⚠️ *You are updating your wallet from:*\n`{current_wallet}`\n*to:*\n`{wallet}`",
                 parse_mode="Markdown"
             )
 
-    add_user(user_id, wallet)
-    await context.bot.send_message(
+    await run_blocking("db", add_user, user_id, wallet)
+    await dispatcher.send_message(
+        context.bot,
         chat_id=chat_id,
         text=f"✅ *Wallet registered successfully!*\n\n`{wallet}`",
         parse_mode="Markdown"
     )
 
 async def balance(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    wallet = get_wallet(update.effective_user.id)
-    if not wallet:
-        await context.bot.send_message(
-            chat_id=update.effective_chat.id,
-            text="❗ *You haven't registered yet.*\nUse `/register <wallet>` first.",
-            parse_mode="Markdown"
-        )
-        return
+    user_id = update.effective_user.id
     try:
-        tokens_sent = get_tokens_sent(wallet)
-        if tokens_sent is None:
-            await context.bot.send_message(
+        credits = await run_blocking("db", get_credit_balance, user_id)
+        if credits is None:
+            await dispatcher.send_message(
+                context.bot,
                 chat_id=update.effective_chat.id,
-                text="⚠️ *Network error: Unable to check credits right now. Please try again later.*",
+                text="❗ *You haven't registered yet.*\nUse `/register <wallet>` first.",
                 parse_mode="Markdown"
             )
             return
-        wishes_used = get_wish_count(update.effective_user.id)
-        credits = max(tokens_sent - wishes_used, 0)
-        await context.bot.send_message(
+        await dispatcher.send_message(
+            context.bot,
             chat_id=update.effective_chat.id,
-            text=f"💰 *Your wish credits:* `{credits}`\n",
+            text=f"💰 *Your wish credits:* `{max(credits, 0)}`\n",
             parse_mode="Markdown"
         )
     except Exception as e:
-        await context.bot.send_message(
+        await dispatcher.send_message(
+            context.bot,
             chat_id=update.effective_chat.id,
             text=f"⚠️ *Error checking credits:*\n`{str(e)}`",
             parse_mode="Markdown"
@@ -212,63 +255,63 @@ async def balance(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def wish(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
-    wallet = get_wallet(user_id)
-    if not wallet:
-        await context.bot.send_message(
-            chat_id=update.effective_chat.id,
-            text="❗ *You haven't registered yet.*\nUse `/register <wallet>` first.",
-            parse_mode="Markdown"
-        )
-        return
-    tokens_sent = get_tokens_sent(wallet)
-    if tokens_sent is None:
-        await context.bot.send_message(
-            chat_id=update.effective_chat.id,
-            text="⚠️ *Network error: Unable to check credits right now. Please try again later.*",
-            parse_mode="Markdown"
-        )
-        return
-    wishes_used = get_wish_count(user_id)
-    credits = tokens_sent - wishes_used
-    if credits < 1:
-        await context.bot.send_message(
+    # Hot path: one conditional UPDATE checks and spends the credit
+    remaining = await run_blocking("db", spend_credit, user_id)
+    if remaining is None:
+        wallet = await run_blocking("db", get_wallet, user_id)
+        if not wallet:
+            await dispatcher.send_message(
+                context.bot,
+                chat_id=update.effective_chat.id,
+                text="❗ *You haven't registered yet.*\nUse `/register <wallet>` first.",
+                parse_mode="Markdown"
+            )
+            return
+        await dispatcher.send_message(
+            context.bot,
             chat_id=update.effective_chat.id,
             text="❗ *You don't have enough wish credits!*\nSend more JAXIM tokens to the bot wallet.",
             parse_mode="Markdown"
         )
         return
-    increment_wish_count(user_id)
-    await context.bot.send_message(
-        chat_id=update.effective_chat.id,
-        text="🧙‍♂️ *Rubbing the Lamp of Jaxim...*✨",
-        parse_mode="Markdown"
-    )
-    quote = get_ai_quote(character="Jeanie")
-    await context.bot.send_message(
-        chat_id=update.effective_chat.id,
-        text=f"💬 *Here's your magical quote:*\n\n_{quote}_",
-        parse_mode="Markdown"
-    )
+    await deliver_quote(context.bot, update.effective_chat.id)
 
 def escape_html(text):
     """Escapes special HTML characters."""
     import html
     return html.escape(str(text))
 
-async def leaderboard(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    top_users = get_leaderboard()
-    if not top_users:
-        await update.message.reply_text("📉 No wishes have been made yet!")
-        return
+display_names = TTLCache(ttl=DISPLAY_NAME_TTL, maxsize=10000)
+leaderboard_cache = TTLCache(ttl=LEADERBOARD_TTL, maxsize=1)
 
-    text = "<b>🏆 Top Wishers Leaderboard 🏆</b>\n\n"
-    for idx, (telegram_id, wallet, count) in enumerate(top_users, 1):
+async def get_display_name(bot, telegram_id):
+    username = display_names.get(telegram_id)
+    if username is None:
         try:
-            user = await context.bot.get_chat(telegram_id)
-            username = f"@{user.username}" if user.username else user.first_name
+            user = await bot.get_chat(telegram_id)
         except Exception:
-            username = f"ID:{telegram_id}"
+            # Not cached, so the next render tries again
+            return f"ID:{telegram_id}"
+        username = f"@{user.username}" if user.username else user.first_name
+        display_names.set(telegram_id, username)
+    return username
+
+# Rendered leaderboard HTML, reused until the ranking changes or the TTL
+# runs out (the TTL covers wishes counted by other processes)
+async def render_leaderboard(bot):
+    version = get_leaderboard_version()
+    cached = leaderboard_cache.get("html")
+    if cached and cached[0] == version:
+        return cached[1]
+
+    top_users = await run_blocking("db", get_leaderboard)
+    if not top_users:
+        return None
 
+    usernames = await asyncio.gather(*(get_display_name(bot, telegram_id) for telegram_id, _, _ in top_users))
+
+    text = "<b>🏆 Top Wishers Leaderboard 🏆</b>\n\n"
+    for idx, ((telegram_id, wallet, count), username) in enumerate(zip(top_users, usernames), 1):
         username_escaped = escape_html(username)
         wallet_escaped = escape_html(wallet) if wallet else "N/A"
         count_escaped = escape_html(count)
@@ -279,110 +322,256 @@ async def leaderboard(update: Update, context: ContextTypes.DEFAULT_TYPE):
             f"    Wishes: <b>{count_escaped}</b>\n\n"
         )
 
-    await update.message.reply_text(text, parse_mode="HTML")
+    leaderboard_cache.set("html", (version, text))
+    return text
 
+async def leaderboard(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    text = await render_leaderboard(context.bot)
+    if not text:
+        await dispatcher.call(
+            update.effective_chat.id,
+            lambda: update.message.reply_text("📉 No wishes have been made yet!")
+        )
+        return
 
-async def wishcount(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    count = get_wish_count(update.effective_user.id)
-    await update.message.reply_text(f"🧞‍♂️ *Your wish count:* `{count}`", parse_mode="Markdown")
+    await dispatcher.call(
+        update.effective_chat.id,
+        lambda: update.message.reply_text(text, parse_mode="HTML")
+    )
 
-def get_tokens_sent(wallet):
-    try:
-        wallet = wallet.lower()
-
-        # Call Covalent API to get transfers of this wallet for the given token
-        transfer_url = f"{COVALENT_BASE_URL}/{CHAIN_NAME}/address/{wallet}/transfers_v2/"
-        transfer_params = {
-            "contract-address": JAXIM_CONTRACT,
-            "key": COVALENT_API_KEY
-        }
-
-        response = requests.get(transfer_url, params=transfer_params)
-        if response.status_code != 200:
-            print(f"⚠️ API Error: {response.status_code} - {response.text}")
-            return None
-
-        data = response.json()
-        if data.get("error"):
-            print(f"❌ API Error: {data.get('error_message')}")
-            return None
-
-        total_sent = 0
-        for item in data["data"]["items"]:
-            for transfer in item["transfers"]:
-                if (
-                    transfer["from_address"].lower() == wallet
-                    and transfer["to_address"].lower() == BOT_WALLET
-                ):
-                    delta = int(transfer["delta"])
-                    decimals = transfer["contract_decimals"]
-                    total_sent += delta / (10 ** decimals)
-
-        return int(total_sent)
 
-    except Exception as e:
-        print("❌ Exception:", str(e))
-        return None
+async def wishcount(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    count = await run_blocking("db", get_wish_count, update.effective_user.id)
+    await dispatcher.call(
+        update.effective_chat.id,
+        lambda: update.message.reply_text(f"🧞‍♂️ *Your wish count:* `{count}`", parse_mode="Markdown")
+    )
 
 # === Transfer Watcher ===
 
-async def watch_transfers(app):
-    last_block = web3.eth.block_number
+WATCHER_CHECKPOINT = "transfers"
 
-    while True:
-        try:
-            latest = web3.eth.block_number
-            if latest > last_block:
-                events = contract.events.Transfer().get_logs(
-                    from_block=last_block + 1,
-                    to_block=latest
-                )
-                for event in events:
-                    sender = event["args"]["from"]
-                    receiver = event["args"]["to"]
-                    amount = event["args"]["value"]
+metrics.register(metrics.Gauge(
+    "jaxim_quote_buffer_depth", "Pre-generated quotes ready to serve", callback=lambda: len(quote_buffer)))
+metrics.register(metrics.Gauge(
+    "jaxim_dispatch_queue_depth", "Telegram calls waiting in the dispatcher", callback=dispatcher.queue_depth))
+
+# keccak("Transfer(address,address,uint256)")
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+
+def logs_filter(from_block, to_block):
+    return {
+        "address": JAXIM_CONTRACT,
+        "fromBlock": hex(from_block),
+        "toBlock": to_block if isinstance(to_block, str) else hex(to_block),
+        # `to` is indexed, so the provider can drop every transfer not sent to us
+        "topics": [TRANSFER_TOPIC, None, "0x" + get_config().bot_wallet[2:].rjust(64, "0")],
+    }
 
-                    if receiver.lower() == BOT_WALLET.lower() and amount == web3.to_wei(1, "ether"):
-                        for telegram_id, user_wallet in get_all_users():
-                            if user_wallet.lower() == sender.lower():
-                                print(f"💡 Detected 1 JAXIM from {sender} (Telegram ID: {telegram_id})")
+async def get_block_number():
+    return int(await get_rpc_client().call("eth_blockNumber"), 16)
 
-                                increment_wish_count(telegram_id)
+# eth_getLogs for a range, halving it whenever the provider rejects the
+# request (too many results, range too large, timeout)
+async def get_transfer_logs(from_block, to_block):
+    try:
+        return await get_rpc_client().call("eth_getLogs", logs_filter(from_block, to_block))
+    except RpcError as e:
+        if from_block >= to_block:
+            raise
+        middle = (from_block + to_block) // 2
+        print(f"⚠️ eth_getLogs {from_block}-{to_block} failed ({e}), splitting")
+        return (
+            await get_transfer_logs(from_block, middle)
+            + await get_transfer_logs(middle + 1, to_block)
+        )
+
+# Steady-state poll: the current head and the logs in (last_block, to_block]
+# in a single batch. to_block is the head from the previous poll, never
+# "latest": behind a load-balanced provider the node answering eth_getLogs
+# can be behind the one that reported the head, and its "latest" would
+# silently cut the range short. Returns (head, logs); logs is None if the
+# provider refused the range.
+async def poll_transfers(last_block, to_block):
+    head, logs = await get_rpc_client().batch([
+        ("eth_blockNumber", []),
+        ("eth_getLogs", [logs_filter(last_block + 1, to_block)]),
+    ])
+    if isinstance(head, RpcError):
+        raise head
+    return int(head, 16), None if isinstance(logs, RpcError) else logs
+
+def notify(telegram_id, future):
+    def log_failure(f):
+        if not f.cancelled() and f.exception() is not None:
+            print(f"❌ Failed to notify {telegram_id}: {f.exception()}")
+    future.add_done_callback(log_failure)
+
+async def handle_transfer(app, log):
+    topics = log["topics"]
+    sender = "0x" + topics[1][-40:]
+    receiver = "0x" + topics[2][-40:]
+    amount = int(log["data"], 16)
+
+    if receiver.lower() != get_config().bot_wallet:
+        return
 
-                                await app.bot.send_message(
-                                    chat_id=telegram_id,
-                                    text="🧙‍♂️ *Rubbing the Lamp of Jaxim...*✨",
-                                    parse_mode="Markdown"
-                                )
+    # Ledger insert is idempotent, so a log we've seen before is skipped;
+    # a new one is credited to the sender's user in the same transaction
+    # (looked up in storage, so users registered on any node are found)
+    is_new, telegram_id = await run_blocking(
+        "db",
+        record_transfer,
+        log["transactionHash"],
+        int(log["logIndex"], 16),
+        sender,
+        amount,
+        int(log["blockNumber"], 16)
+    )
+    # Backfilled history (no app) is credited but never spent: those wishes
+    # were delivered when the transfers happened
+    if is_new and amount == CREDIT_UNIT and app is not None:
+        if telegram_id is not None:
+            print(f"💡 Detected 1 JAXIM from {sender} (Telegram ID: {telegram_id})")
+
+            # The credit was just recorded, so this only fails if the user had
+            # already spent more than the ledger holds (history not backfilled)
+            if await run_blocking("db", spend_credit, telegram_id) is None:
+                print(f"⚠️ No credit left for the auto-wish of {telegram_id} after a new transfer; "
+                      f"run backfill_ledger.py if their pre-ledger history is missing")
+                return
 
-                                quote = get_ai_quote(character="Jeanie")
-                                await app.bot.send_message(
-                                    chat_id=telegram_id,
-                                    text=f"💬 *Here's your magical quote:*\n\n_{quote}_",
-                                    parse_mode="Markdown"
-                                )
+            # Start the delivery and move on; its messages go through the
+            # dispatcher in order at whatever rate Telegram allows
+            notify(telegram_id, start_quote_delivery(app.bot, telegram_id))
+
+async def handle_logs(app, logs, to_block, checkpoint=WATCHER_CHECKPOINT):
+    for log in sorted(logs, key=lambda l: (int(l["blockNumber"], 16), int(l["logIndex"], 16))):
+        await handle_transfer(app, log)
+    metrics.WATCHER_EVENTS.observe(len(logs))
+    metrics.WATCHER_EVENTS_TOTAL.inc(len(logs))
+    await run_blocking("db", set_checkpoint, checkpoint, to_block)
+
+# Scan (last_block, latest] in chunks of at most WATCHER_MAX_BLOCK_RANGE
+# blocks, WATCHER_BATCH_CHUNKS chunks per JSON-RPC batch, committing `checkpoint`
+# after each chunk's events are handled. Returns the last block that was
+# fully processed. `app` is None when backfilling (see backfill_ledger.py),
+# and `lock`, if given, is renewed before every batch.
+async def scan_blocks(app, last_block, latest, checkpoint=WATCHER_CHECKPOINT, lock=None):
+    config = get_config()
+    while last_block < latest:
+        # Long catch-ups outlast the lock lease; renew it (and stop if it's gone)
+        if lock is not None and not await run_blocking("db", lock.ensure):
+            raise RuntimeError("lost the watcher lock")
+        ranges = []
+        start = last_block + 1
+        while start <= latest and len(ranges) < config.watcher_batch_chunks:
+            end = min(start + config.watcher_max_block_range - 1, latest)
+            ranges.append((start, end))
+            start = end + 1
+        results = await get_rpc_client().batch([("eth_getLogs", [logs_filter(a, b)]) for a, b in ranges])
+        for (from_block, to_block), logs in zip(ranges, results):
+            if isinstance(logs, RpcError):
+                logs = await get_transfer_logs(from_block, to_block)
+            await handle_logs(app, logs, to_block, checkpoint)
+            last_block = to_block
+    return last_block
+
+async def load_checkpoint():
+    last_block = await run_blocking("db", get_checkpoint, WATCHER_CHECKPOINT)
+    if last_block is None:
+        start_block = get_config().watcher_start_block
+        if start_block is not None:
+            last_block = start_block - 1
+        else:
+            last_block = await get_block_number()
+        await run_blocking("db", set_checkpoint, WATCHER_CHECKPOINT, last_block)
+    return last_block
+
+# Only one node scans blocks at a time: the holder of the MySQL watcher lock.
+# The others keep retrying the lock and take over if the leader goes away.
+# A node that loses the lock mid-scan can't double-credit, because
+# record_transfer only lets the first insert of a log through.
+async def watch_transfers(app, lock):
+    config = get_config()
+    last_block = None
+    # Chain head seen on the previous poll; logs are only read up to it
+    head = None
 
-                last_block = latest
+    while True:
+        try:
+            if not await run_blocking("db", lock.ensure):
+                if last_block is not None:
+                    print("🔕 Lost the watcher lock, standing by")
+                last_block = None
+                await asyncio.sleep(config.watcher_poll_interval)
+                continue
+
+            if last_block is None:
+                last_block = await load_checkpoint()
+                print(f"🔭 Watching transfers from block {last_block + 1}")
+
+            if head is not None and last_block < head <= last_block + config.watcher_max_block_range:
+                to_block = head
+                head, logs = await poll_transfers(last_block, to_block)
+                if logs is None:
+                    logs = await get_transfer_logs(last_block + 1, to_block)
+                await handle_logs(app, logs, to_block)
+                last_block = to_block
+            else:
+                if head is not None and head > last_block:
+                    last_block = await scan_blocks(app, last_block, head, lock=lock)
+                head = await get_block_number()
+            metrics.WATCHER_BLOCK_LAG.set(max(head - last_block, 0))
 
         except Exception as e:
             print("❌ Error watching transfers:", str(e))
+            # Resume from whatever was committed
+            last_block = None
 
-        await asyncio.sleep(10)
+        await asyncio.sleep(config.watcher_poll_interval)
 
 # === Main Bot ===
 
+# Only the update types the handlers below use, so Telegram doesn't send
+# (and we don't parse) anything else
+ALLOWED_UPDATES = [Update.MESSAGE, Update.MY_CHAT_MEMBER]
+
+def register_handlers(application):
+    application.add_handler(ChatMemberHandler(instrument_handler(welcome_on_added), chat_member_types=["my_chat_member"]))
+    application.add_handler(CommandHandler("start", instrument_handler(start)))
+    application.add_handler(CommandHandler("howto", instrument_handler(howto)))
+    application.add_handler(CommandHandler("register", instrument_handler(register)))
+    application.add_handler(CommandHandler("balance", instrument_handler(balance)))
+    application.add_handler(CommandHandler("leaderboard", instrument_handler(leaderboard)))
+    application.add_handler(CommandHandler("wishcount", instrument_handler(wishcount)))
+    application.add_handler(CommandHandler("wish", instrument_handler(wish)))
+
 if __name__ == '__main__':
+    metrics.startup_phase("import")
+    try:
+        config = get_config()
+    except ConfigError as e:
+        raise SystemExit(f"❌ {e}")
+    metrics.startup_phase("config")
     init_db()
-    app.add_handler(CommandHandler("start", start))
-    app.add_handler(CommandHandler("howto", howto))
-    app.add_handler(CommandHandler("register", register))
-    app.add_handler(CommandHandler("balance", balance))
-    app.add_handler(CommandHandler("leaderboard", leaderboard))
-    app.add_handler(CommandHandler("wishcount", wishcount))  
-    app.add_handler(CommandHandler("wish", wish))
-
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    loop.create_task(watch_transfers(app))
-    print("🤖 Bot running...")
-    app.run_polling()
+    metrics.startup_phase("init_db")
+    app = build_application()
+    register_handlers(app)
+    metrics.startup_phase("build_app")
+
+    if config.bot_mode == "webhook":
+        print(f"🤖 Bot running (webhook on {config.webhook_listen}:{config.webhook_port}/{config.webhook_path})...")
+        # Telegram's X-Telegram-Bot-Api-Secret-Token header is checked on every
+        # request; accepted updates are acknowledged and put on app.update_queue
+        app.run_webhook(
+            listen=config.webhook_listen,
+            port=config.webhook_port,
+            url_path=config.webhook_path,
+            webhook_url=f"{config.webhook_url.rstrip('/')}/{config.webhook_path}",
+            secret_token=config.webhook_secret,
+            allowed_updates=ALLOWED_UPDATES
+        )
+    else:
+        print("🤖 Bot running...")
+        app.run_polling(allowed_updates=ALLOWED_UPDATES)
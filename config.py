@@ -0,0 +1,138 @@
+import os
+import re
+import threading
+from dotenv import load_dotenv
+
+# Most modules read their settings at import time (numbers through env_int
+# and env_float below), so .env is loaded as soon as this module is imported.
+# metrics imports it, and every entry point imports metrics or config before
+# anything else.
+load_dotenv()
+
+JAXIM_CONTRACT = "0x082Ef77013B51f4a808e83a4d345cdc88cFdd9c4"
+CHAIN_NAME = "base-mainnet"
+
+ADDRESS_PATTERN = re.compile(r"^0x[0-9a-fA-F]{40}$")
+
+class ConfigError(Exception):
+    pass
+
+# Parse a numeric setting, falling back to `default` (and noting the problem)
+# if it isn't a number
+def _number(kind, env, name, default, problems):
+    try:
+        return kind(env.get(name, default))
+    except ValueError:
+        problems.append(f"{name} must be {'an integer' if kind is int else 'a number'}, got {env.get(name)!r}")
+        return kind(default)
+
+# Problems with the settings modules read at import time through env_int and
+# env_float, so a bad value can't crash an import; Config.validate() reports them
+_setting_problems = []
+
+def env_int(name, default):
+    return _number(int, os.environ, name, default, _setting_problems)
+
+def env_float(name, default):
+    return _number(float, os.environ, name, default, _setting_problems)
+
+# Deployment settings for the bot, read from the environment (and .env).
+# validate() reports every problem at once instead of failing on the first
+# setting that happens to be used.
+class Config:
+    def __init__(self, env=None):
+        env = os.environ if env is None else env
+        self._problems = []
+
+        self.bot_token = env.get("BOT_TOKEN")
+        self.bot_wallet = (env.get("BOT_WALLET") or "").strip().lower()
+        # Comma-separated BASE_RPC gives the RPC client endpoints to fail over to
+        self.rpc_urls = [url.strip() for url in (env.get("BASE_RPC") or "").split(",") if url.strip()]
+        self.covalent_api_key = env.get("COVALENT_API_KEY")
+        self.covalent_base_url = env.get("COVALENT_BASE_URL", "https://api.covalenthq.com/v1")
+
+        # Update ingestion: "polling" (default) or "webhook"
+        self.bot_mode = env.get("BOT_MODE", "polling")
+        self.webhook_url = env.get("WEBHOOK_URL")  # public base URL Telegram posts to
+        self.webhook_path = env.get("WEBHOOK_PATH", "telegram")
+        self.webhook_listen = env.get("WEBHOOK_LISTEN", "0.0.0.0")
+        self.webhook_port = self._int(env, "WEBHOOK_PORT", "8443")
+        self.webhook_secret = env.get("WEBHOOK_SECRET")
+        # Point at a local Bot API server (e.g. "http://localhost:8081/bot")
+        self.telegram_base_url = env.get("TELEGRAM_BASE_URL")
+
+        # "mysql" (default) or "sqlite"; see storage_backends.py
+        self.storage_backend = env.get("STORAGE_BACKEND", "mysql")
+        self._mysql = {name: env.get(name) for name in ("MYSQL_HOST", "MYSQL_PORT", "MYSQL_DB", "MYSQL_USER")}
+        self.mysql_password = env.get("MYSQL_PASSWORD")
+        self.mysql_pool_size = self._int(env, "MYSQL_POOL_SIZE", "5")
+        self.mysql_pool_timeout = self._float(env, "MYSQL_POOL_TIMEOUT", "10")
+        self.sqlite_path = env.get("SQLITE_PATH", "jaxim.db")
+        # Writes are committed in batches of up to SQLITE_COMMIT_BATCH, at
+        # most SQLITE_COMMIT_INTERVAL seconds after the first one
+        self.sqlite_commit_interval = self._float(env, "SQLITE_COMMIT_INTERVAL", "0.05")
+        self.sqlite_commit_batch = self._int(env, "SQLITE_COMMIT_BATCH", "100")
+        self.sqlite_busy_timeout = self._float(env, "SQLITE_BUSY_TIMEOUT", "5")
+
+        # Transfer watcher (bot.py); WATCHER_ENABLED=0 on nodes that only serve commands
+        self.watcher_enabled = env.get("WATCHER_ENABLED", "1") != "0"
+        self.watcher_poll_interval = self._float(env, "WATCHER_POLL_INTERVAL", "10")
+        # Largest block span asked for in one eth_getLogs call
+        self.watcher_max_block_range = self._int(env, "WATCHER_MAX_BLOCK_RANGE", "2000")
+        # eth_getLogs ranges sent together in one JSON-RPC batch while catching up
+        self.watcher_batch_chunks = self._int(env, "WATCHER_BATCH_CHUNKS", "5")
+        # Where to start the very first scan (None: the current head)
+        self.watcher_start_block = self._int(env, "WATCHER_START_BLOCK", "-1") if env.get("WATCHER_START_BLOCK") else None
+
+    # Keyword arguments for mysql.connector.connect()
+    def mysql_connect_args(self):
+        return {
+            "host": self._mysql["MYSQL_HOST"],
+            "port": int(self._mysql["MYSQL_PORT"]),
+            "database": self._mysql["MYSQL_DB"],
+            "user": self._mysql["MYSQL_USER"],
+            "password": self.mysql_password,
+        }
+
+    def _int(self, env, name, default):
+        return _number(int, env, name, default, self._problems)
+
+    def _float(self, env, name, default):
+        return _number(float, env, name, default, self._problems)
+
+    def validate(self):
+        problems = list(dict.fromkeys(self._problems + _setting_problems))
+        for name, value in [
+            ("BOT_TOKEN", self.bot_token),
+            ("BOT_WALLET", self.bot_wallet),
+            ("BASE_RPC", self.rpc_urls),
+            ("COVALENT_API_KEY", self.covalent_api_key),
+            *(self._mysql.items() if self.storage_backend == "mysql" else []),
+        ]:
+            if not value:
+                problems.append(f"{name} is not set")
+        if self.bot_wallet and not ADDRESS_PATTERN.match(self.bot_wallet):
+            problems.append(f"BOT_WALLET is not an address: {self.bot_wallet!r}")
+        if self.storage_backend not in ("mysql", "sqlite"):
+            problems.append(f"STORAGE_BACKEND must be 'mysql' or 'sqlite', got {self.storage_backend!r}")
+        elif self.storage_backend == "mysql" and self._mysql["MYSQL_PORT"] and not self._mysql["MYSQL_PORT"].isdigit():
+            problems.append(f"MYSQL_PORT must be an integer, got {self._mysql['MYSQL_PORT']!r}")
+        if self.bot_mode not in ("polling", "webhook"):
+            problems.append(f"BOT_MODE must be 'polling' or 'webhook', got {self.bot_mode!r}")
+        elif self.bot_mode == "webhook" and not (self.webhook_url and self.webhook_secret):
+            problems.append("BOT_MODE=webhook needs WEBHOOK_URL and WEBHOOK_SECRET")
+        if problems:
+            raise ConfigError("Invalid configuration:\n  - " + "\n  - ".join(problems))
+        return self
+
+_config = None
+_config_lock = threading.Lock()
+
+# The validated config, loaded on first use and shared afterwards
+def get_config():
+    global _config
+    if _config is None:
+        with _config_lock:
+            if _config is None:
+                _config = Config().validate()
+    return _config
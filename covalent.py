@@ -0,0 +1,98 @@
+import threading
+from config import get_config, env_int, env_float, JAXIM_CONTRACT, CHAIN_NAME
+from metrics import timed
+
+# Transfers per Covalent page; wallets with more history take several pages
+COVALENT_PAGE_SIZE = env_int("COVALENT_PAGE_SIZE", "1000")
+# Seconds to connect, and to wait for each response
+COVALENT_CONNECT_TIMEOUT = env_float("COVALENT_CONNECT_TIMEOUT", "5")
+COVALENT_READ_TIMEOUT = env_float("COVALENT_READ_TIMEOUT", "30")
+
+class CovalentError(Exception):
+    pass
+
+def transfers_url(wallet):
+    return f"{get_config().covalent_base_url}/{CHAIN_NAME}/address/{wallet.lower()}/transfers_v2/"
+
+def transfers_params(page):
+    return {
+        "contract-address": JAXIM_CONTRACT,
+        "key": get_config().covalent_api_key,
+        "page-number": page,
+        "page-size": COVALENT_PAGE_SIZE,
+    }
+
+# Raw JAXIM (smallest unit, exact) sent from `wallet` to the bot wallet in
+# one page, and whether there are more pages
+def parse_page(data, wallet):
+    if data.get("error"):
+        raise CovalentError(data.get("error_message") or "Covalent returned an error")
+    wallet = wallet.lower()
+    bot_wallet = get_config().bot_wallet
+    total_raw = 0
+    for item in data["data"]["items"]:
+        for transfer in item.get("transfers") or []:
+            if (
+                (transfer.get("from_address") or "").lower() == wallet
+                and (transfer.get("to_address") or "").lower() == bot_wallet
+            ):
+                total_raw += int(transfer["delta"])
+    pagination = data["data"].get("pagination") or {}
+    return total_raw, bool(pagination.get("has_more"))
+
+_session = None
+_session_lock = threading.Lock()
+
+# One keep-alive connection pool for every blocking Covalent call, sized to
+# the executor's Covalent concurrency
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from executor import LIMITS
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=LIMITS["covalent"])
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+# Blocking: everything `wallet` has sent the bot, following pagination
+def get_sent_raw(wallet):
+    session = get_session()
+    total_raw = 0
+    page = 0
+    while True:
+        with timed("covalent", "transfers_v2"):
+            response = session.get(
+                transfers_url(wallet),
+                params=transfers_params(page),
+                timeout=(COVALENT_CONNECT_TIMEOUT, COVALENT_READ_TIMEOUT)
+            )
+        if response.status_code != 200:
+            raise CovalentError(f"HTTP {response.status_code}: {response.text[:200]}")
+        page_raw, has_more = parse_page(response.json(), wallet)
+        total_raw += page_raw
+        if not has_more:
+            return total_raw
+        page += 1
+
+# Async version for bulk jobs, on a caller-owned aiohttp session
+async def fetch_sent_raw(session, wallet):
+    total_raw = 0
+    page = 0
+    while True:
+        with timed("covalent", "transfers_v2"):
+            async with session.get(transfers_url(wallet), params=transfers_params(page)) as response:
+                if response.status != 200:
+                    raise CovalentError(f"HTTP {response.status}: {(await response.text())[:200]}")
+                data = await response.json(content_type=None)
+        page_raw, has_more = parse_page(data, wallet)
+        total_raw += page_raw
+        if not has_more:
+            return total_raw
+        page += 1
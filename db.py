@@ -1,85 +1,83 @@
-import os
-import mysql.connector
-
-def get_mysql_connection():
-    return mysql.connector.connect(
-        host=os.getenv("MYSQL_HOST"),
-        port=int(os.getenv("MYSQL_PORT")),
-        database=os.getenv("MYSQL_DB"),
-        user=os.getenv("MYSQL_USER"),
-        password=os.getenv("MYSQL_PASSWORD")
-    )
+import threading
+from storage_backends import get_storage, CREDIT_UNIT
+
+# Storage lives behind a backend (storage_backends.py, chosen by
+# STORAGE_BACKEND); these functions are the interface the rest of the bot uses.
 
 # Initialize DB with wish_count support
 def init_db():
-    conn = get_mysql_connection()
-    c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            telegram_id BIGINT PRIMARY KEY,
-            wallet VARCHAR(100),
-            wish_count INT DEFAULT 0
-        )
-    ''')
-    conn.commit()
-    conn.close()
+    get_storage().init_db()
+
+# Commit anything the backend is still batching and close its connections
+def close_storage():
+    get_storage().close()
 
 # Add new user or update wallet without resetting wish count
 def add_user(telegram_id, wallet):
-    conn = get_mysql_connection()
-    c = conn.cursor()
-    # Add user if not exists
-    c.execute('''
-        INSERT IGNORE INTO users (telegram_id, wallet, wish_count)
-        VALUES (%s, %s, 0)
-    ''', (telegram_id, wallet))
-    # Always update wallet
-    c.execute('''
-        UPDATE users SET wallet = %s WHERE telegram_id = %s
-    ''', (wallet, telegram_id))
-    conn.commit()
-    conn.close()
+    get_storage().add_user(telegram_id, wallet)
+    _bump_leaderboard_version()
 
 # Get a user's wallet
 def get_wallet(telegram_id):
-    conn = get_mysql_connection()
-    c = conn.cursor()
-    c.execute("SELECT wallet FROM users WHERE telegram_id=%s", (telegram_id,))
-    result = c.fetchone()
-    conn.close()
-    return result[0] if result else None
-
-# Increment the user's wish count
-def increment_wish_count(telegram_id):
-    conn = get_mysql_connection()
-    c = conn.cursor()
-    c.execute("UPDATE users SET wish_count = wish_count + 1 WHERE telegram_id=%s", (telegram_id,))
-    conn.commit()
-    conn.close()
+    return get_storage().get_wallet(telegram_id)
+
+# Atomically spend one wish credit. Returns the credits left afterwards, or
+# None if the user isn't registered or has no credit to spend.
+def spend_credit(telegram_id):
+    remaining = get_storage().spend_credit(telegram_id)
+    if remaining is not None:
+        _bump_leaderboard_version()
+    return remaining
+
+# Credits left (None if the user isn't registered)
+def get_credit_balance(telegram_id):
+    return get_storage().get_credit_balance(telegram_id)
 
 # Get a user's current wish count
 def get_wish_count(telegram_id):
-    conn = get_mysql_connection()
-    c = conn.cursor()
-    c.execute("SELECT wish_count FROM users WHERE telegram_id=%s", (telegram_id,))
-    result = c.fetchone()
-    conn.close()
-    return result[0] if result else 0
+    return get_storage().get_wish_count(telegram_id)
+
+# Bumped whenever this process changes something the leaderboard shows,
+# so cached renderings can tell they are stale
+_leaderboard_version = 0
+_leaderboard_lock = threading.Lock()
+
+def _bump_leaderboard_version():
+    global _leaderboard_version
+    with _leaderboard_lock:
+        _leaderboard_version += 1
+
+def get_leaderboard_version():
+    return _leaderboard_version
 
 # Return top users by wish count
 def get_leaderboard(limit=10):
-    conn = get_mysql_connection()
-    c = conn.cursor()
-    c.execute("SELECT telegram_id, wallet, wish_count FROM users ORDER BY wish_count DESC LIMIT %s", (limit,))
-    results = c.fetchall()
-    conn.close()
-    return results
+    return get_storage().get_leaderboard(limit)
 
 # Get all users (for token tracking, etc.)
 def get_all_users():
-    conn = get_mysql_connection()
-    c = conn.cursor()
-    c.execute('SELECT telegram_id, wallet FROM users')
-    results = c.fetchall()
-    conn.close()
-    return results
+    return get_storage().get_all_users()
+
+# One page of users after `after_id` (keyset pagination, so callers can walk
+# the whole table without holding it in memory):
+# [(telegram_id, wallet, wish_count, credited_raw), ...]
+def get_users_page(after_id=None, limit=500):
+    return get_storage().get_users_page(after_id, limit)
+
+# Record a transfer to the bot wallet and credit the user who registered the
+# sending wallet, in one transaction. Returns (is_new, telegram_id of the
+# credited user or None); is_new is False if it was already recorded.
+def record_transfer(tx_hash, log_index, from_wallet, amount, block_number):
+    return get_storage().record_transfer(tx_hash, log_index, from_wallet, amount, block_number)
+
+# Set every user's credits to what the ledger has for their wallet (run after
+# backfilling history into the ledger). Returns the number of users.
+def recompute_credits():
+    return get_storage().recompute_credits()
+
+# Read a watcher's block checkpoint (None if it has never run)
+def get_checkpoint(name):
+    return get_storage().get_checkpoint(name)
+
+def set_checkpoint(name, block_number):
+    get_storage().set_checkpoint(name, block_number)
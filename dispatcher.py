@@ -0,0 +1,226 @@
+import time
+import asyncio
+import contextvars
+from collections import deque
+from telegram.error import RetryAfter
+from config import env_int, env_float
+from metrics import timed
+
+# Telegram allows ~30 messages/s overall, ~1/s per private chat and
+# ~20/min per group, averaged: a chat may burst a few messages before the
+# per-chat rate applies (override via env)
+DISPATCH_GLOBAL_RATE = env_float("DISPATCH_GLOBAL_RATE", "30")
+DISPATCH_PRIVATE_INTERVAL = env_float("DISPATCH_PRIVATE_INTERVAL", "1")
+DISPATCH_GROUP_INTERVAL = env_float("DISPATCH_GROUP_INTERVAL", "3")
+DISPATCH_CHAT_BURST = env_int("DISPATCH_CHAT_BURST", "3")
+# RetryAfter from this many different chats within DISPATCH_GLOBAL_WINDOW
+# seconds is taken as the bot-wide limit and pauses every chat
+DISPATCH_GLOBAL_CHATS = env_int("DISPATCH_GLOBAL_CHATS", "3")
+DISPATCH_GLOBAL_WINDOW = env_float("DISPATCH_GLOBAL_WINDOW", "1")
+DISPATCH_WORKERS = env_int("DISPATCH_WORKERS", "8")
+DISPATCH_MAX_RETRIES = env_int("DISPATCH_MAX_RETRIES", "5")
+
+def retry_after_seconds(error):
+    delay = error.retry_after
+    return delay.total_seconds() if hasattr(delay, "total_seconds") else float(delay)
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    # Stop handing out tokens for a while (Telegram told us to back off), and
+    # start again from an empty bucket rather than a burst
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+        self.updated = self.paused_until
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + max(0.0, now - self.updated) * self.rate)
+        self.updated = max(self.updated, now)
+
+    # Seconds until a token can be taken (0 if one is available now)
+    def wait_time(self):
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    # Seconds until the bucket is full again
+    def idle_time(self):
+        now = time.monotonic()
+        self._refill(now)
+        return max(0.0, self.paused_until - now) + (self.capacity - self.tokens) / self.rate
+
+    # Take a token without waiting (call once wait_time() is 0)
+    def take(self):
+        self._refill(time.monotonic())
+        self.tokens -= 1
+
+    async def acquire(self):
+        while True:
+            delay = self.wait_time()
+            if delay <= 0:
+                self.tokens -= 1
+                return
+            await asyncio.sleep(delay)
+
+# Central outbound queue for Telegram calls.
+# Each chat has its own FIFO, and at most one worker serves a chat at a time,
+# so messages to a chat stay in order while different chats go out in
+# parallel. Every call takes a token from its chat's bucket and from the
+# global bucket. A RetryAfter pauses only that chat, unless several chats
+# hit one at once (the bot-wide limit), and then the call is retried.
+class MessageDispatcher:
+    def __init__(self, global_rate=DISPATCH_GLOBAL_RATE, workers=DISPATCH_WORKERS, max_retries=DISPATCH_MAX_RETRIES):
+        self.global_rate = global_rate
+        self.workers = workers
+        self.max_retries = max_retries
+        self._bucket = None
+        self._ready = None
+        self._queues = {}
+        self._chat_buckets = {}
+        self._recent_limits = deque()
+        self._tasks = []
+
+    @property
+    def running(self):
+        return bool(self._tasks)
+
+    def queue_depth(self):
+        return sum(len(q) for q in self._queues.values())
+
+    def chat_interval(self, chat_id):
+        return DISPATCH_GROUP_INTERVAL if int(chat_id) < 0 else DISPATCH_PRIVATE_INTERVAL
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(1 / self.chat_interval(chat_id), DISPATCH_CHAT_BURST)
+        return bucket
+
+    # A full bucket is the same as a new one, so idle chats are forgotten once
+    # theirs has refilled
+    def _forget_idle_chat(self, chat_id):
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None or chat_id in self._queues:
+            return
+        delay = bucket.idle_time()
+        if delay > 0:
+            asyncio.get_running_loop().call_later(delay, self._forget_idle_chat, chat_id)
+        else:
+            del self._chat_buckets[chat_id]
+
+    # Whether RetryAfter for `chat_id` looks like the bot-wide limit: other
+    # chats have been told to wait within the last DISPATCH_GLOBAL_WINDOW
+    def _is_global_limit(self, chat_id):
+        now = time.monotonic()
+        self._recent_limits.append((now, chat_id))
+        while self._recent_limits[0][0] < now - DISPATCH_GLOBAL_WINDOW:
+            self._recent_limits.popleft()
+        return len({chat for _, chat in self._recent_limits}) >= DISPATCH_GLOBAL_CHATS
+
+    # Queue `make_call()` (a function returning a coroutine) for `chat_id`.
+    # Returns a future with the call's result. If the dispatcher isn't running
+    # the call is made right away.
+    def submit(self, chat_id, make_call):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if not self.running:
+            task = loop.create_task(make_call())
+            task.add_done_callback(lambda t: _copy_result(t, future))
+            return future
+
+        queue = self._queues.get(chat_id)
+        if queue is None:
+            queue = self._queues[chat_id] = deque()
+            self._schedule(chat_id)
+        # Remember the caller's context so its trace sees the send
+        queue.append([make_call, future, 0, contextvars.copy_context()])
+        return future
+
+    async def call(self, chat_id, make_call):
+        return await self.submit(chat_id, make_call)
+
+    def send_message(self, bot, chat_id, **kwargs):
+        return self.submit(chat_id, lambda: bot.send_message(chat_id=chat_id, **kwargs))
+
+    def _schedule(self, chat_id):
+        delay = self._chat_bucket(chat_id).wait_time()
+        if delay > 0:
+            asyncio.get_running_loop().call_later(delay, self._ready.put_nowait, chat_id)
+        else:
+            self._ready.put_nowait(chat_id)
+
+    async def _worker(self):
+        while True:
+            chat_id = await self._ready.get()
+            queue = self._queues[chat_id]
+            job = queue[0]
+            make_call, future, _, context = job
+
+            if future.cancelled():
+                queue.popleft()
+            else:
+                self._chat_bucket(chat_id).take()
+                await self._bucket.acquire()
+                try:
+                    result = await context.run(asyncio.ensure_future, _timed_send(make_call))
+                except RetryAfter as e:
+                    delay = retry_after_seconds(e)
+                    job[2] += 1
+                    self._chat_bucket(chat_id).pause(delay)
+                    if self._is_global_limit(chat_id):
+                        self._bucket.pause(delay)
+                    if job[2] > self.max_retries:
+                        queue.popleft()
+                        if not future.done():
+                            future.set_exception(e)
+                    else:
+                        print(f"⏳ Telegram asked us to wait {delay:.1f}s (chat {chat_id})")
+                except Exception as e:
+                    queue.popleft()
+                    if not future.done():
+                        future.set_exception(e)
+                else:
+                    queue.popleft()
+                    if not future.done():
+                        future.set_result(result)
+
+            if queue:
+                self._schedule(chat_id)
+            else:
+                del self._queues[chat_id]
+                self._forget_idle_chat(chat_id)
+
+    async def run(self):
+        self._bucket = TokenBucket(self.global_rate)
+        self._ready = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        try:
+            await asyncio.gather(*self._tasks)
+        finally:
+            for task in self._tasks:
+                task.cancel()
+            self._tasks = []
+
+async def _timed_send(make_call):
+    with timed("telegram", "send"):
+        return await make_call()
+
+def _copy_result(task, future):
+    if future.cancelled():
+        return
+    if task.cancelled():
+        future.cancel()
+    elif task.exception() is not None:
+        future.set_exception(task.exception())
+    else:
+        future.set_result(task.result())
+
+dispatcher = MessageDispatcher()
@@ -0,0 +1,73 @@
+import asyncio
+import functools
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from config import env_int
+
+# Max in-flight blocking calls per external dependency (override via env)
+LIMITS = {
+    "db": env_int("DB_CONCURRENCY", env_int("MYSQL_POOL_SIZE", "5")),
+    "covalent": env_int("COVALENT_CONCURRENCY", "4"),
+    "gemini": env_int("GEMINI_CONCURRENCY", "2"),
+    "rpc": env_int("RPC_CONCURRENCY", "2"),
+    # Local file writes (quote buffer, used quotes), kept off the db slots
+    "file": env_int("FILE_CONCURRENCY", "2"),
+}
+
+# One shared pool sized so every dependency can use its full limit at once
+_executor = ThreadPoolExecutor(max_workers=sum(LIMITS.values()), thread_name_prefix="jaxim-io")
+_semaphores = {}
+
+def _semaphore(dependency):
+    sem = _semaphores.get(dependency)
+    if sem is None:
+        sem = asyncio.Semaphore(LIMITS.get(dependency, 1))
+        _semaphores[dependency] = sem
+    return sem
+
+# Run a blocking call off the event loop, bounded by its dependency's limit.
+# The caller's contextvars go along (metrics trace spans rely on this).
+async def run_blocking(dependency, func, *args, **kwargs):
+    async with _semaphore(dependency):
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(_executor, functools.partial(context.run, func, *args, **kwargs))
+
+# Iterate a blocking generator off the event loop, bounded like run_blocking,
+# yielding its items as they are produced. Leaving the loop early stops the
+# generator at its next item.
+async def stream_blocking(dependency, func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    items = asyncio.Queue()
+    stopped = threading.Event()
+    done = object()
+
+    def produce():
+        try:
+            for item in func(*args, **kwargs):
+                if stopped.is_set():
+                    break
+                loop.call_soon_threadsafe(items.put_nowait, (item, None))
+        except BaseException as e:
+            loop.call_soon_threadsafe(items.put_nowait, (done, e))
+        else:
+            loop.call_soon_threadsafe(items.put_nowait, (done, None))
+
+    async with _semaphore(dependency):
+        context = contextvars.copy_context()
+        worker = loop.run_in_executor(_executor, functools.partial(context.run, produce))
+        try:
+            while True:
+                item, error = await items.get()
+                if item is done:
+                    if error is not None:
+                        raise error
+                    break
+                yield item
+            await worker
+        finally:
+            stopped.set()
+
+def shutdown():
+    _executor.shutdown(wait=False, cancel_futures=True)
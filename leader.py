@@ -0,0 +1,115 @@
+import os
+from storage_backends import get_storage, get_mysql_connection
+from config import env_int
+from metrics import timed_call
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; FileLeaderLock can't exclude other processes there
+    fcntl = None
+
+# A leader whose connection goes quiet for this long loses the lock
+LEADER_LEASE_SECONDS = env_int("LEADER_LEASE_SECONDS", "60")
+
+# Cluster-wide leadership through a MySQL named lock (GET_LOCK).
+# The lock lives on a dedicated session, so it is released automatically when
+# the holder's connection closes, dies or idles past LEADER_LEASE_SECONDS;
+# whichever node calls ensure() next takes over. Call ensure() more often than
+# the lease to keep the lock (it doubles as the heartbeat).
+class LeaderLock:
+    def __init__(self, name, connect=get_mysql_connection, lease=LEADER_LEASE_SECONDS):
+        self.name = name
+        self.lease = lease
+        self._connect = connect
+        self._conn = None
+        self.held = False
+
+    def _reconnect(self):
+        self.close()
+        self._conn = self._connect()
+        self._conn.autocommit = True
+        c = self._conn.cursor()
+        c.execute("SET SESSION wait_timeout = %s", (self.lease,))
+        c.close()
+
+    # Try to take the lock, or confirm we still hold it. Returns True if this
+    # node is the leader.
+    @timed_call("mysql", "leader_lock")
+    def ensure(self):
+        try:
+            if self._conn is None or not self._conn.is_connected():
+                self._reconnect()
+                self.held = False
+            c = self._conn.cursor()
+            if self.held:
+                c.execute("SELECT IS_USED_LOCK(%s) = CONNECTION_ID()", (self.name,))
+            else:
+                c.execute("SELECT GET_LOCK(%s, 0)", (self.name,))
+            result = c.fetchone()
+            c.close()
+            self.held = bool(result and result[0] == 1)
+        except Exception as e:
+            print(f"⚠️ Leader lock check failed: {e}")
+            self.close()
+        return self.held
+
+    def release(self):
+        if self._conn is not None and self.held:
+            try:
+                c = self._conn.cursor()
+                c.execute("SELECT RELEASE_LOCK(%s)", (self.name,))
+                c.fetchone()
+                c.close()
+            except Exception:
+                pass
+        self.close()
+
+    def close(self):
+        self.held = False
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+# Single-host equivalent for the SQLite backend: an exclusive flock on a file
+# next to the database. The OS drops it when the holder exits or crashes.
+# Without fcntl (Windows) every process gets the lock, so run one node there.
+class FileLeaderLock:
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self._fd = None
+        self.held = False
+
+    def ensure(self):
+        if self.held:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        self.held = True
+        return True
+
+    def release(self):
+        self.close()
+
+    def close(self):
+        self.held = False
+        if self._fd is not None:
+            try:
+                if fcntl:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+            finally:
+                os.close(self._fd)
+            self._fd = None
+
+# The leader lock that fits the configured storage backend
+def get_leader_lock(name):
+    return get_storage().leader_lock(name)
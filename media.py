@@ -0,0 +1,91 @@
+import os
+import json
+import hashlib
+import threading
+from telegram.error import BadRequest
+from executor import run_blocking
+
+MEDIA_CACHE_FILE = os.getenv("MEDIA_CACHE_FILE", "media_cache.json")
+
+# BadRequest messages that mean Telegram no longer accepts a file_id
+FILE_ID_ERRORS = ("wrong file identifier", "wrong remote file id", "file reference expired")
+
+def is_file_id_error(error):
+    message = str(error).lower()
+    return any(text in message for text in FILE_ID_ERRORS)
+
+# Remembers the Telegram file_id for each uploaded asset, keyed by path and
+# checked against the file's SHA-256 so an edited asset is uploaded again.
+# The hash itself is only recomputed when the file's size or mtime change.
+class MediaRegistry:
+    def __init__(self, path=MEDIA_CACHE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._hashes = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Could not load media cache: {e}")
+
+    def _save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def content_hash(self, asset_path):
+        stat = os.stat(asset_path)
+        key = (stat.st_size, stat.st_mtime_ns)
+        cached = self._hashes.get(asset_path)
+        if cached and cached[0] == key:
+            return cached[1]
+        digest = hashlib.sha256()
+        with open(asset_path, "rb") as f:
+            for block in iter(lambda: f.read(65536), b""):
+                digest.update(block)
+        self._hashes[asset_path] = (key, digest.hexdigest())
+        return digest.hexdigest()
+
+    def get_file_id(self, asset_path):
+        entry = self._entries.get(asset_path)
+        if entry and entry["sha256"] == self.content_hash(asset_path):
+            return entry["file_id"]
+        return None
+
+    def remember(self, asset_path, file_id):
+        with self._lock:
+            self._entries[asset_path] = {"sha256": self.content_hash(asset_path), "file_id": file_id}
+            self._save()
+
+    def forget(self, asset_path):
+        with self._lock:
+            if self._entries.pop(asset_path, None) is not None:
+                self._save()
+
+    # Send `asset_path` via `send(media)`, passing the cached file_id when we
+    # have one and uploading the file otherwise. `file_id_of(message)` pulls
+    # the new file_id out of the sent message. Hashing the asset and writing
+    # the cache file run on the "file" executor slots.
+    async def send(self, asset_path, send, file_id_of):
+        file_id = await run_blocking("file", self.get_file_id, asset_path)
+        if file_id:
+            try:
+                return await send(file_id)
+            except BadRequest as e:
+                # Telegram can drop file_ids; fall back to a fresh upload.
+                # Any other error (a bad chat, RetryAfter, timeouts) goes up
+                # to the caller and the dispatcher with the file_id kept.
+                if not is_file_id_error(e):
+                    raise
+                print(f"⚠️ Cached file_id for {asset_path} rejected, re-uploading: {e}")
+                await run_blocking("file", self.forget, asset_path)
+
+        with open(asset_path, "rb") as f:
+            message = await send(f)
+        await run_blocking("file", self.remember, asset_path, file_id_of(message))
+        return message
+
+media_registry = MediaRegistry()
@@ -0,0 +1,248 @@
+import os
+import time
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import config  # loads .env before the settings below are read
+
+# Port for the Prometheus endpoint; unset/0 disables it
+METRICS_PORT = config.env_int("METRICS_PORT", "0")
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+# Print a span breakdown for every update when set to 1
+TRACE_UPDATES = os.getenv("TRACE_UPDATES", "0") == "1"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+def _labels_key(labelnames, labels):
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values)) + list(extra or [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _labels_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [(self.name, _format_labels(self.labelnames, key), value) for key, value in items]
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def __init__(self, name, help, labelnames=(), callback=None):
+        super().__init__(name, help, labelnames)
+        # callback() -> value, read at scrape time (unlabelled gauges only)
+        self.callback = callback
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_labels_key(self.labelnames, labels)] = value
+
+    def samples(self):
+        if self.callback is not None:
+            try:
+                return [(self.name, "", self.callback())]
+            except Exception:
+                return []
+        return super().samples()
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts, sum, count]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _labels_key(self.labelnames, labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts), total, count) for key, (counts, total, count) in self._values.items()]
+        result = []
+        for key, counts, total, count in items:
+            for bound, bucket_count in zip(self.buckets, counts):
+                result.append((self.name + "_bucket", _format_labels(self.labelnames, key, [("le", bound)]), bucket_count))
+            result.append((self.name + "_bucket", _format_labels(self.labelnames, key, [("le", "+Inf")]), count))
+            result.append((self.name + "_sum", _format_labels(self.labelnames, key), total))
+            result.append((self.name + "_count", _format_labels(self.labelnames, key), count))
+        return result
+
+REGISTRY = []
+
+def register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+# Prometheus text exposition format (0.0.4)
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{labels} {value}")
+    return "\n".join(lines) + "\n"
+
+# === Bot metrics ===
+
+HANDLER_LATENCY = register(Histogram(
+    "jaxim_handler_seconds", "Time spent handling a Telegram update, by handler", ("handler",)))
+HANDLER_ERRORS = register(Counter(
+    "jaxim_handler_errors_total", "Exceptions raised by handlers", ("handler",)))
+EXTERNAL_LATENCY = register(Histogram(
+    "jaxim_external_call_seconds", "Latency of calls to external services", ("service", "operation")))
+EXTERNAL_ERRORS = register(Counter(
+    "jaxim_external_call_errors_total", "Failed calls to external services", ("service", "operation")))
+WATCHER_BLOCK_LAG = register(Gauge(
+    "jaxim_watcher_block_lag", "Chain head minus the last block the watcher processed"))
+WATCHER_EVENTS = register(Histogram(
+    "jaxim_watcher_events_per_scan", "Transfer events handled per watcher scan",
+    buckets=(0, 1, 2, 5, 10, 25, 50, 100, 250, 1000)))
+WATCHER_EVENTS_TOTAL = register(Counter(
+    "jaxim_watcher_events_total", "Transfer events handled by the watcher"))
+STARTUP_PHASE = register(Gauge(
+    "jaxim_startup_phase_seconds", "Time spent in each startup phase", ("phase",)))
+FIRST_UPDATE = register(Gauge(
+    "jaxim_startup_first_update_seconds", "Time from start to the first handled update"))
+
+# === Startup timing ===
+
+# The clock starts when this module is first imported; bot.py imports it
+# before anything heavy so the "import" phase covers the rest of its imports
+_startup_began = time.perf_counter()
+_startup_mark = _startup_began
+startup_phases = []
+_first_update_seen = False
+
+# Close the current startup phase and start timing the next one
+def startup_phase(name):
+    global _startup_mark
+    now = time.perf_counter()
+    startup_phases.append((name, now - _startup_mark))
+    STARTUP_PHASE.set(now - _startup_mark, phase=name)
+    _startup_mark = now
+
+def startup_report():
+    phases = ", ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in startup_phases)
+    print(f"⏱️ Started in {(_startup_mark - _startup_began) * 1000:.0f}ms [{phases}]")
+
+def _first_update():
+    global _first_update_seen
+    _first_update_seen = True
+    elapsed = time.perf_counter() - _startup_began
+    FIRST_UPDATE.set(elapsed)
+    print(f"⏱️ First update handled {elapsed:.2f}s after start")
+
+# Trace spans for the update currently being handled (TRACE_UPDATES=1)
+_current_trace = contextvars.ContextVar("jaxim_trace", default=None)
+
+@contextmanager
+def timed(service, operation):
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        EXTERNAL_ERRORS.inc(service=service, operation=operation)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        EXTERNAL_LATENCY.observe(elapsed, service=service, operation=operation)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.append((f"{service}.{operation}", elapsed))
+
+# Decorator form of timed() for plain functions
+def timed_call(service, operation=None):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(service, operation or func.__name__):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# Wrap an async handler to record its latency/errors (and trace, if enabled)
+def instrument_handler(func):
+    name = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(update, context):
+        trace = [] if TRACE_UPDATES else None
+        token = _current_trace.set(trace)
+        started = time.perf_counter()
+        try:
+            return await func(update, context)
+        except Exception:
+            HANDLER_ERRORS.inc(handler=name)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            HANDLER_LATENCY.observe(elapsed, handler=name)
+            _current_trace.reset(token)
+            if not _first_update_seen:
+                _first_update()
+            if trace is not None:
+                spans = ", ".join(f"{span}={seconds * 1000:.1f}ms" for span, seconds in trace)
+                print(f"🧵 update {getattr(update, 'update_id', '?')} {name} {elapsed * 1000:.1f}ms [{spans}]")
+    return wrapper
+
+def start_metrics_server(port=METRICS_PORT, host=METRICS_HOST):
+    if not port:
+        return None
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics").start()
+    print(f"📊 Metrics on http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,80 @@
+"""Copy the bot's data between storage backends, or to/from a JSON Lines file.
+
+Each side is "mysql" (the MYSQL_* settings), "sqlite" / "sqlite:<path>"
+(SQLITE_PATH by default) or a path ending in .jsonl. Rows already in the
+destination are overwritten, and the destination schema is created first.
+
+    python migrate_storage.py mysql sqlite:jaxim.db
+    python migrate_storage.py sqlite backup.jsonl
+    python migrate_storage.py backup.jsonl mysql
+"""
+import sys
+import json
+import time
+import argparse
+
+from config import get_config, ConfigError
+from storage_backends import TABLES, MySQLBackend, SQLiteBackend
+
+def open_backend(spec):
+    try:
+        config = get_config()
+    except ConfigError as e:
+        raise SystemExit(f"❌ {e}")
+    if spec == "mysql":
+        return MySQLBackend.from_config(config)
+    if spec == "sqlite" or spec.startswith("sqlite:"):
+        return SQLiteBackend.from_config(config, spec.partition(":")[2] or None)
+    raise SystemExit(f"❌ Unknown storage {spec!r} (expected mysql, sqlite[:path] or a .jsonl file)")
+
+def read_jsonl(path):
+    rows = {table: [] for table in TABLES}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                rows[record["table"]].append(tuple(record["row"]))
+    return rows
+
+def migrate(source, dest):
+    started = time.perf_counter()
+    if source.endswith(".jsonl"):
+        exported = read_jsonl(source)
+        export_rows = lambda table: exported[table]
+        source_backend = None
+    else:
+        source_backend = open_backend(source)
+        export_rows = source_backend.export_rows
+
+    if dest.endswith(".jsonl"):
+        counts = {}
+        with open(dest, "w", encoding="utf-8") as f:
+            for table in TABLES:
+                counts[table] = 0
+                for row in export_rows(table):
+                    f.write(json.dumps({"table": table, "row": list(row)}) + "\n")
+                    counts[table] += 1
+    else:
+        dest_backend = open_backend(dest)
+        dest_backend.init_db()
+        counts = {table: dest_backend.import_rows(table, export_rows(table)) for table in TABLES}
+        dest_backend.close()
+
+    if source_backend is not None:
+        source_backend.close()
+    return counts, time.perf_counter() - started
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Copy Jaxim Jeanie data between storage backends")
+    parser.add_argument("source", help="mysql, sqlite[:path] or a .jsonl file")
+    parser.add_argument("dest", help="mysql, sqlite[:path] or a .jsonl file")
+    args = parser.parse_args(argv)
+    if args.source == args.dest:
+        raise SystemExit("❌ Source and destination are the same")
+
+    counts, elapsed = migrate(args.source, args.dest)
+    summary = ", ".join(f"{count} {table}" for table, count in counts.items())
+    print(f"📦 Copied {summary} from {args.source} to {args.dest} in {elapsed:.2f}s")
+
+if __name__ == "__main__":
+    sys.exit(main())
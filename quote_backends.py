@@ -0,0 +1,126 @@
+import os
+import json
+import threading
+from metrics import timed
+
+# Sampling settings shared by every backend
+TEMPERATURE = 0.9
+TOP_K = 40
+TOP_P = 0.95
+
+# A quote backend turns a prompt into text, either all at once or as a
+# stream of chunks
+class QuoteBackend:
+    name = None
+
+    def generate(self, prompt):
+        raise NotImplementedError
+
+    def stream(self, prompt):
+        yield self.generate(prompt)
+
+class GeminiBackend(QuoteBackend):
+    name = "gemini"
+
+    def __init__(self, api_key=None, model_name=None):
+        # Imported here so local-model deployments don't need the Gemini SDK
+        import google.generativeai as genai
+        from google.generativeai.types import GenerationConfig
+
+        # GEMINI_API_ENDPOINT swaps in another host (a proxy or a local stand-in)
+        endpoint = os.getenv("GEMINI_API_ENDPOINT")
+        if endpoint:
+            genai.configure(
+                api_key=api_key or os.getenv("GEMINI_API_KEY"),
+                transport="rest",
+                client_options={"api_endpoint": endpoint}
+            )
+        else:
+            genai.configure(api_key=api_key or os.getenv("GEMINI_API_KEY"))
+        self.model = genai.GenerativeModel(
+            model_name or os.getenv("GEMINI_MODEL", "models/gemini-2.0-flash"),
+            generation_config=GenerationConfig(
+                temperature=TEMPERATURE,
+                top_k=TOP_K,
+                top_p=TOP_P,
+            )
+        )
+
+    def generate(self, prompt):
+        with timed("gemini", "generate"):
+            return self.model.generate_content(prompt).text
+
+    def stream(self, prompt):
+        with timed("gemini", "stream"):
+            for chunk in self.model.generate_content(prompt, stream=True):
+                if chunk.text:
+                    yield chunk.text
+
+# Talks to an Ollama-compatible server (/api/generate) over one keep-alive
+# session, and asks the server to keep the model loaded between requests
+class OllamaBackend(QuoteBackend):
+    name = "ollama"
+
+    def __init__(self, base_url=None, model=None, keep_alive=None, timeout=None):
+        base_url = base_url or os.getenv("OLLAMA_URL", "http://localhost:11434")
+        self.url = base_url.rstrip("/") + "/api/generate"
+        self.model = model or os.getenv("OLLAMA_MODEL", "mistral")
+        self.keep_alive = keep_alive or os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+        # (connect, read) seconds
+        self.timeout = timeout or (
+            float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "3")),
+            float(os.getenv("OLLAMA_READ_TIMEOUT", "60")),
+        )
+        import requests
+
+        self.session = requests.Session()
+
+    def _payload(self, prompt, stream):
+        return {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": stream,
+            "keep_alive": self.keep_alive,
+            "options": {"temperature": TEMPERATURE, "top_k": TOP_K, "top_p": TOP_P},
+        }
+
+    def generate(self, prompt):
+        with timed("ollama", "generate"):
+            response = self.session.post(self.url, json=self._payload(prompt, False), timeout=self.timeout)
+            response.raise_for_status()
+            return response.json().get("response", "")
+
+    def stream(self, prompt):
+        with timed("ollama", "stream"), \
+                self.session.post(self.url, json=self._payload(prompt, True), timeout=self.timeout, stream=True) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                if data.get("error"):
+                    raise RuntimeError(data["error"])
+                if data.get("response"):
+                    yield data["response"]
+                if data.get("done"):
+                    break
+
+BACKENDS = {
+    GeminiBackend.name: GeminiBackend,
+    OllamaBackend.name: OllamaBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+# The configured backend (QUOTE_BACKEND, default "gemini"), built once and shared
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                name = os.getenv("QUOTE_BACKEND", "gemini")
+                if name not in BACKENDS:
+                    raise ValueError(f"Unknown QUOTE_BACKEND {name!r}, expected one of {sorted(BACKENDS)}")
+                _backend = BACKENDS[name]()
+    return _backend
@@ -0,0 +1,139 @@
+import os
+import json
+import asyncio
+import threading
+from collections import deque
+from config import env_int, env_float
+from quotes import get_ai_quote, get_ai_quotes, EXHAUSTED_QUOTE
+from executor import run_blocking
+
+QUOTE_BUFFER_FILE = os.getenv("QUOTE_BUFFER_FILE", "quote_buffer.json")
+QUOTE_BUFFER_LOW = env_int("QUOTE_BUFFER_LOW", "5")
+QUOTE_BUFFER_HIGH = env_int("QUOTE_BUFFER_HIGH", "20")
+QUOTE_BUFFER_POLL = env_float("QUOTE_BUFFER_POLL", "5")
+QUOTE_BATCH_SIZE = env_int("QUOTE_BATCH_SIZE", "10")
+
+# Bounded, file-backed queue of pre-generated quotes.
+# Every quote in here has already been saved to the used set by quotes.py,
+# so popping one never hands out a repeat.
+class QuoteBuffer:
+    def __init__(self, path=QUOTE_BUFFER_FILE, low=QUOTE_BUFFER_LOW, high=QUOTE_BUFFER_HIGH, character="Jeanie"):
+        self.path = path
+        self.low = low
+        self.high = high
+        self.character = character
+        self._quotes = deque(maxlen=high)
+        self._lock = threading.Lock()
+        self._wakeup = None
+        # Background save in progress (at most one), and whether the buffer
+        # changed since that save took its snapshot
+        self._writer = None
+        self._dirty = False
+        self.load()
+
+    def __len__(self):
+        return len(self._quotes)
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not load quote buffer: {e}")
+            return
+        with self._lock:
+            for quote in saved:
+                if quote not in self._quotes:
+                    self._quotes.append(quote)
+
+    # Write to a temp file and swap so a crash never leaves half a buffer on disk
+    def save(self):
+        with self._lock:
+            snapshot = list(self._quotes)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def push(self, quote):
+        with self._lock:
+            if not quote or quote == EXHAUSTED_QUOTE or quote in self._quotes:
+                return False
+            if len(self._quotes) >= self.high:
+                return False
+            self._quotes.append(quote)
+            return True
+
+    # O(1) pop; returns None when the buffer is empty
+    def pop_nowait(self):
+        with self._lock:
+            quote = self._quotes.popleft() if self._quotes else None
+        if quote is not None:
+            if len(self._quotes) < self.low and self._wakeup is not None:
+                self._wakeup.set()
+            self._persist_soon()
+        return quote
+
+    # Save in the background. Only one save runs at a time; changes made
+    # while it runs are picked up by one more save when it finishes.
+    def _persist_soon(self):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self.save()
+            return
+        self._dirty = True
+        if self._writer is None:
+            self._writer = asyncio.ensure_future(self._write_pending())
+
+    async def _write_pending(self):
+        try:
+            while self._dirty:
+                self._dirty = False
+                try:
+                    await run_blocking("file", self.save)
+                except Exception as e:
+                    print(f"⚠️ Could not save quote buffer: {e}")
+        finally:
+            self._writer = None
+
+    # Pop a buffered quote, generating one live only if the buffer is empty
+    async def pop(self):
+        quote = self.pop_nowait()
+        if quote is not None:
+            return quote
+        return await run_blocking("gemini", get_ai_quote, character=self.character)
+
+    async def _refill(self):
+        added = 0
+        while len(self._quotes) < self.high:
+            wanted = min(QUOTE_BATCH_SIZE, self.high - len(self._quotes))
+            quotes = await run_blocking("gemini", get_ai_quotes, wanted, character=self.character)
+            batch_added = sum(1 for quote in quotes if self.push(quote))
+            if not batch_added:
+                break
+            added += batch_added
+        if added:
+            self._persist_soon()
+        return added
+
+    # Background producer: tops the buffer up to the high watermark whenever
+    # it falls below the low watermark
+    async def run(self):
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                if len(self._quotes) < self.low:
+                    added = await self._refill()
+                    print(f"📜 Quote buffer refilled with {added} quotes ({len(self._quotes)} ready)")
+            except Exception as e:
+                print("❌ Error refilling quote buffer:", str(e))
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=QUOTE_BUFFER_POLL)
+            except asyncio.TimeoutError:
+                pass
+
+quote_buffer = QuoteBuffer()
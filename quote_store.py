@@ -0,0 +1,179 @@
+import os
+import re
+import hashlib
+import threading
+import unicodedata
+from config import env_float
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; cross-process locking is skipped there
+    fcntl = None
+
+# Signatures with at least this estimated Jaccard similarity count as duplicates
+NEAR_DUPLICATE_THRESHOLD = env_float("QUOTE_DUPLICATE_THRESHOLD", "0.8")
+
+MINHASH_PERMUTATIONS = 32
+MINHASH_BANDS = 8
+SHINGLE_SIZE = 4
+# Quotes whose normalized text and signature are kept between a contains()
+# and the add() that usually follows it
+ANALYSIS_CACHE_SIZE = 64
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Fixed coefficients so signatures are stable across restarts
+_PERMUTATIONS = [
+    (
+        int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "big") % _MERSENNE_PRIME | 1,
+        int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "big") % _MERSENNE_PRIME,
+    )
+    for i in range(MINHASH_PERMUTATIONS)
+]
+
+# Lowercase, drop punctuation/quote marks/emoji and collapse whitespace, so
+# "Believe!" and "“Believe” ✨" normalize to the same text
+def normalize(quote):
+    text = unicodedata.normalize("NFKC", quote).lower()
+    text = "".join(ch if ch.isalnum() or ch.isspace() else " " for ch in text)
+    return re.sub(r"\s+", " ", text).strip()
+
+def fingerprint(normalized):
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+def minhash(normalized):
+    text = normalized.replace(" ", "_")
+    if len(text) <= SHINGLE_SIZE:
+        shingles = {text}
+    else:
+        shingles = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "big") for s in shingles]
+    return tuple(
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+def similarity(sig_a, sig_b):
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+# Used-quote index backed by the append-only used_quotes.txt.
+# The file is read once; after that only lines appended since the last read
+# (by us or another process) are indexed, and while its size, mtime and inode
+# are unchanged it isn't opened at all. Appends take an exclusive file lock
+# and re-check for duplicates under it, so concurrent writers can't both add
+# the same quote.
+class QuoteStore:
+    def __init__(self, path, threshold=NEAR_DUPLICATE_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self._lock = threading.RLock()
+        self._offset = 0
+        # os.stat() of the file as of the last catch-up
+        self._stat = None
+        # quote -> (fingerprint, signature), or None if it normalizes to nothing
+        self._analyses = {}
+        self._fingerprints = set()
+        self._signatures = []
+        self._buckets = {}
+        self.quotes = []
+        self._catch_up()
+
+    def __len__(self):
+        return len(self.quotes)
+
+    def _bands(self, signature):
+        rows = MINHASH_PERMUTATIONS // MINHASH_BANDS
+        return [(band, signature[band * rows:(band + 1) * rows]) for band in range(MINHASH_BANDS)]
+
+    # (fingerprint, MinHash signature) of a stripped quote, or None if it has
+    # no text. Call with self._lock held.
+    def _analyze(self, quote):
+        if quote in self._analyses:
+            return self._analyses[quote]
+        normalized = normalize(quote)
+        analysis = (fingerprint(normalized), minhash(normalized)) if normalized else None
+        if len(self._analyses) >= ANALYSIS_CACHE_SIZE:
+            del self._analyses[next(iter(self._analyses))]
+        self._analyses[quote] = analysis
+        return analysis
+
+    def _index(self, quote):
+        analysis = self._analyze(quote)
+        if analysis is None:
+            return
+        quote_fingerprint, signature = analysis
+        self._fingerprints.add(quote_fingerprint)
+        position = len(self._signatures)
+        self._signatures.append(signature)
+        for key in self._bands(signature):
+            self._buckets.setdefault(key, []).append(position)
+        self.quotes.append(quote)
+
+    # Index any lines appended to the file since we last looked
+    def _catch_up(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return
+        key = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+        if key == self._stat:
+            return
+        size = stat.st_size
+        if size < self._offset or (self._stat is not None and stat.st_ino != self._stat[2]):
+            # File was truncated or replaced; start over
+            self._offset = 0
+            self._fingerprints.clear()
+            self._signatures.clear()
+            self._buckets.clear()
+            self.quotes.clear()
+        if size != self._offset:
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read()
+            # Leave a trailing partial line for next time
+            end = data.rfind(b"\n") + 1
+            for line in data[:end].decode("utf-8", errors="replace").splitlines():
+                if line.strip():
+                    self._index(line.strip())
+            self._offset += end
+        self._stat = key
+
+    def _is_duplicate(self, quote):
+        analysis = self._analyze(quote)
+        if analysis is None or analysis[0] in self._fingerprints:
+            return True
+        signature = analysis[1]
+        seen = set()
+        for key in self._bands(signature):
+            for position in self._buckets.get(key, ()):
+                if position in seen:
+                    continue
+                seen.add(position)
+                if similarity(signature, self._signatures[position]) >= self.threshold:
+                    return True
+        return False
+
+    def contains(self, quote):
+        with self._lock:
+            self._catch_up()
+            return self._is_duplicate(quote.strip())
+
+    # Append a quote unless it (or a near-duplicate) is already used.
+    # Returns True if the quote was added.
+    def add(self, quote):
+        quote = quote.strip()
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    self._catch_up()
+                    if self._is_duplicate(quote):
+                        return False
+                    f.write(quote + "\n")
+                    f.flush()
+                    self._catch_up()
+                finally:
+                    if fcntl:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+        return True
@@ -0,0 +1,110 @@
+import os
+import asyncio
+from config import env_float
+from dispatcher import dispatcher
+from executor import run_blocking, stream_blocking
+from quote_buffer import quote_buffer
+from quotes import stream_ai_quote, accept_streamed_quote
+
+# Stream a fresh quote into the message when the buffer is empty (0 = wait
+# for a complete quote instead)
+QUOTE_STREAMING = os.getenv("QUOTE_STREAMING", "1") != "0"
+# Minimum seconds between partial edits of one message (on top of the
+# dispatcher's per-chat pacing)
+QUOTE_EDIT_INTERVAL = env_float("QUOTE_EDIT_INTERVAL", "1")
+
+PLACEHOLDER_TEXT = "🧙‍♂️ *Rubbing the Lamp of Jaxim...*✨"
+QUOTE_MARKS = "\"'“”"
+
+def quote_text(quote):
+    return f"💬 *Here's your magical quote:*\n\n_{quote}_"
+
+# Partial text goes out without parse_mode: half a reply can have unbalanced
+# Markdown that Telegram would reject
+def partial_quote_text(text):
+    return f"💬 Here's your magical quote:\n\n{text.strip().strip(QUOTE_MARKS)} …"
+
+# A sent message that keeps showing the newest text. Edits go through the
+# dispatcher one at a time; text that arrives while an edit is pending
+# replaces the previous text instead of queueing another edit.
+class LiveMessage:
+    def __init__(self, bot, chat_id, message_id, interval=QUOTE_EDIT_INTERVAL):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.interval = interval
+        self._text = None
+        self._shown = None
+        self._changed = asyncio.Event()
+        self._task = None
+
+    def _edit(self, text, **kwargs):
+        return dispatcher.call(self.chat_id, lambda: self.bot.edit_message_text(
+            text, chat_id=self.chat_id, message_id=self.message_id, **kwargs
+        ))
+
+    def update(self, text):
+        self._text = text
+        self._changed.set()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await self._changed.wait()
+            self._changed.clear()
+            text = self._text
+            if text != self._shown:
+                try:
+                    await self._edit(text)
+                    self._shown = text
+                except Exception as e:
+                    print(f"⚠️ Could not update message in chat {self.chat_id}: {e}")
+                await asyncio.sleep(self.interval)
+
+    # Stop the partial edits and set the final text
+    async def finish(self, text, **kwargs):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self._edit(text, **kwargs)
+
+# Stream one quote into `message`. Returns the quote once it has passed the
+# used-quote check and been saved, or None if the stream failed or produced
+# a repeat.
+async def stream_quote(message, character):
+    text = ""
+    try:
+        async for chunk in stream_blocking("gemini", stream_ai_quote, character):
+            text += chunk
+            message.update(partial_quote_text(text))
+    except Exception as e:
+        print(f"⚠️ Quote stream failed: {e}")
+        return None
+    return await run_blocking("file", accept_streamed_quote, text)
+
+# Send the placeholder and turn it into a quote in place: at once if one is
+# buffered, otherwise streamed in as the backend writes it. A streamed quote
+# that turns out to be a repeat is replaced by a regular (non-streamed) one.
+async def deliver_quote(bot, chat_id):
+    placeholder = await dispatcher.send_message(bot, chat_id=chat_id, text=PLACEHOLDER_TEXT, parse_mode="Markdown")
+    message = LiveMessage(bot, chat_id, placeholder.message_id)
+
+    quote = quote_buffer.pop_nowait()
+    if quote is None and QUOTE_STREAMING:
+        quote = await stream_quote(message, quote_buffer.character)
+    if quote is None:
+        quote = await quote_buffer.pop()
+    await message.finish(quote_text(quote), parse_mode="Markdown")
+    return quote
+
+# Deliveries started from the watcher, kept referenced until they finish
+_deliveries = set()
+
+# Fire-and-forget deliver_quote(); returns the task
+def start_quote_delivery(bot, chat_id):
+    task = asyncio.ensure_future(deliver_quote(bot, chat_id))
+    _deliveries.add(task)
+    task.add_done_callback(_deliveries.discard)
+    return task
@@ -1,19 +1,14 @@
-import subprocess
+from quote_backends import OllamaBackend
+
+# One backend (and one keep-alive HTTP session) for the whole process
+backend = OllamaBackend()
 
 def get_ai_quote(character="Jaxim"):
     prompt = f"You are {character}, a friendly and wise Genie. Give me a short motivational quote."
 
-    # Run Ollama locally with the Mistral model
-    result = subprocess.run(
-        ["ollama", "run", "mistral"],
-        input=prompt.encode(),
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE
-    )
-
-    # Decode and return the model's response
-    response = result.stdout.decode().strip()
-    return response
+    # Stream the reply from the local Ollama server as it is generated
+    response = "".join(backend.stream(prompt))
+    return response.strip()
 
 # Example usage
 if __name__ == "__main__":
@@ -1,50 +1,104 @@
 import os
-from dotenv import load_dotenv
-import google.generativeai as genai
-from google.generativeai.types import GenerationConfig
+import re
+import json
+import config  # loads .env before quote_store and quote_backends read their settings
+from quote_store import QuoteStore
+from quote_backends import get_backend
 
-load_dotenv()
+USED_QUOTES_FILE = os.getenv("USED_QUOTES_FILE", "used_quotes.txt")
+EXHAUSTED_QUOTE = "✨ All possible quotes are exhausted for now. Try again later!"
 
-USED_QUOTES_FILE = "used_quotes.txt"
+# Quotes shorter/longer than this are treated as junk from a bad parse
+MIN_QUOTE_LENGTH = 20
+MAX_QUOTE_LENGTH = 400
+
+# Loaded once per process, then kept current incrementally
+used_quotes = QuoteStore(USED_QUOTES_FILE)
 
 def load_used_quotes():
-    if not os.path.exists(USED_QUOTES_FILE):
-        return set()
-    with open(USED_QUOTES_FILE, "r", encoding="utf-8") as f:
-        return set(line.strip() for line in f if line.strip())
+    return set(used_quotes.quotes)
+
+def is_used_quote(quote):
+    return used_quotes.contains(quote)
 
+# Returns False if the quote (or a near-duplicate of it) was already used
 def save_quote(quote):
-    with open(USED_QUOTES_FILE, "a", encoding="utf-8") as f:
-        f.write(quote + "\n")
+    return used_quotes.add(quote)
 
-def get_ai_quote(character="Jaxim", max_attempts=5):
-    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+def build_prompt(character, n):
+    return f"""You're a whimsical, all-knowing genie named {character} — part fortune teller, part idea whisperer.
+                You're sassy, sweet, a little silly, but always uplifting.
+                Give me {n} different magical, two-sentence motivational quotes in your charming voice.
+                Make each one unique, sparkly, and full of flair.
+                Reply only with a JSON array of {n} strings, one quote per string — no extras."""
 
-    model = genai.GenerativeModel(
-        "models/gemini-2.0-flash",
-        generation_config=GenerationConfig(
-            temperature=0.9,
-            top_k=40,
-            top_p=0.95,
-        )
-    )
+# Single quote as plain text, so a streamed reply can be shown as it arrives
+def build_stream_prompt(character):
+    return f"""You're a whimsical, all-knowing genie named {character} — part fortune teller, part idea whisperer.
+                You're sassy, sweet, a little silly, but always uplifting.
+                Give me one magical, two-sentence motivational quote in your charming voice.
+                Make it unique, sparkly, and full of flair.
+                Reply with only the quote itself — no quotation marks, no extras."""
 
-    used_quotes = load_used_quotes()
+# Pull the quotes out of a model reply. Prefers the JSON array we asked for
+# and falls back to one quote per non-empty line.
+def parse_quotes(text):
+    text = text.strip()
+    match = re.search(r"\[.*\]", text, re.DOTALL)
+    candidates = None
+    if match:
+        try:
+            candidates = json.loads(match.group(0))
+        except ValueError:
+            candidates = None
+    if not isinstance(candidates, list):
+        candidates = [line for line in text.splitlines() if line.strip() and line.strip() not in ("[", "]", "```", "```json")]
 
-    for attempt in range(max_attempts):
-        prompt = f"""You're a whimsical, all-knowing genie named {character} — part fortune teller, part idea whisperer. 
-                    You're sassy, sweet, a little silly, but always uplifting. 
-                    Give me one magical, two-sentence motivational quote in your charming voice. 
-                    Make it unique, sparkly, and full of flair. Only reply with the quote — no extras."""
-        response = model.generate_content(prompt)
+    quotes = []
+    for candidate in candidates:
+        if not isinstance(candidate, str):
+            continue
+        quote = re.sub(r"^\s*(?:\d+[.)]|[-*•])\s*", "", candidate).strip().strip(",").strip()
+        if len(quote) >= 2 and quote[0] == quote[-1] and quote[0] in "\"'“”":
+            quote = quote[1:-1].strip()
+        if MIN_QUOTE_LENGTH <= len(quote) <= MAX_QUOTE_LENGTH:
+            quotes.append(quote)
+    return quotes
+
+# Generate up to n fresh quotes with a single backend request. Quotes already
+# used (or near-duplicates within the reply) are dropped; survivors are saved
+# as used.
+def get_ai_quotes(n, character="Jaxim"):
+    text = get_backend().generate(build_prompt(character, n))
 
-        quote = next((line.strip() for line in response.text.strip().splitlines() if line.strip()), None)
+    fresh = []
+    for quote in parse_quotes(text):
+        if save_quote(quote):
+            fresh.append(quote)
+            if len(fresh) == n:
+                break
+    return fresh
 
-        if quote and quote not in used_quotes:
-            save_quote(quote)
-            return quote
+# Blocking generator over the text of one quote as the backend writes it
+def stream_ai_quote(character="Jaxim"):
+    yield from get_backend().stream(build_stream_prompt(character))
+
+# Check a finished streamed reply against the used set and save it. Returns
+# the quote, or None if the reply was junk or the quote was already used.
+def accept_streamed_quote(text):
+    # One quote was asked for, so line breaks inside it aren't separators
+    quotes = parse_quotes(" ".join(text.split()))
+    if quotes and save_quote(quotes[0]):
+        return quotes[0]
+    return None
+
+def get_ai_quote(character="Jaxim", max_attempts=5):
+    for attempt in range(max_attempts):
+        quotes = get_ai_quotes(1, character=character)
+        if quotes:
+            return quotes[0]
 
-    return "✨ All possible quotes are exhausted for now. Try again later!"
+    return EXHAUSTED_QUOTE
 
 
 if __name__ == "__main__":
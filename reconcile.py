@@ -0,0 +1,141 @@
+"""Reconcile wish credits against on-chain history.
+
+Walks every registered user (a page at a time), fetches each wallet's full
+JAXIM transfer history to the bot wallet from Covalent with up to
+--concurrency requests in flight, and compares the exact raw total with the
+user's wish_count and credited_raw (their total in the transfer ledger, which
+is what credits count).
+
+    python reconcile.py --concurrency 16 --output reconcile.json
+
+Statuses:
+    ok              credited_raw matches the chain and wishes are covered
+    overspent       more wishes were made than the chain pays for
+    under_credited  the chain shows more than credited_raw (history not backfilled yet,
+                    see backfill_ledger.py)
+    over_credited   credited_raw is more than the chain shows
+    error           Covalent could not be read for this wallet
+
+Exits with 1 if any user is not "ok".
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+from config import get_config, env_int, ConfigError
+from covalent import fetch_sent_raw, COVALENT_CONNECT_TIMEOUT, COVALENT_READ_TIMEOUT
+from db import get_users_page, CREDIT_UNIT
+from executor import run_blocking, shutdown as shutdown_executor
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Reconcile wish credits against on-chain transfers")
+    parser.add_argument("--concurrency", type=int, default=env_int("RECONCILE_CONCURRENCY", "8"),
+                        help="Covalent requests in flight at once")
+    parser.add_argument("--page-size", type=int, default=500, help="users read from the database per query")
+    parser.add_argument("--output", help="write the full report (every user) as JSON")
+    return parser.parse_args(argv)
+
+def classify(onchain_raw, wish_count, credited_raw):
+    if wish_count > onchain_raw // CREDIT_UNIT:
+        return "overspent"
+    if credited_raw < onchain_raw:
+        return "under_credited"
+    if credited_raw > onchain_raw:
+        return "over_credited"
+    return "ok"
+
+async def produce_users(queue, page_size):
+    after_id = None
+    while True:
+        page = await run_blocking("db", get_users_page, after_id, page_size)
+        for user in page:
+            await queue.put(user)
+        if len(page) < page_size:
+            return
+        after_id = page[-1][0]
+
+async def check_users(session, queue, rows):
+    while True:
+        user = await queue.get()
+        if user is None:
+            return
+        telegram_id, wallet, wish_count, credited_raw = user
+        row = {
+            "telegram_id": telegram_id,
+            "wallet": wallet,
+            "wish_count": wish_count,
+            "credited_raw": str(credited_raw),
+        }
+        try:
+            onchain_raw = await fetch_sent_raw(session, wallet)
+        except Exception as e:
+            row.update(status="error", error=str(e))
+        else:
+            row.update(
+                status=classify(onchain_raw, wish_count, credited_raw),
+                onchain_raw=str(onchain_raw),
+                onchain_credits=onchain_raw // CREDIT_UNIT,
+                credits_left=onchain_raw // CREDIT_UNIT - wish_count,
+            )
+        rows.append(row)
+
+async def reconcile(concurrency, page_size):
+    import aiohttp
+
+    rows = []
+    # Bounded, so users are read from the database only as fast as they're checked
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    timeout = aiohttp.ClientTimeout(sock_connect=COVALENT_CONNECT_TIMEOUT, sock_read=COVALENT_READ_TIMEOUT)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        workers = [asyncio.create_task(check_users(session, queue, rows)) for _ in range(concurrency)]
+        try:
+            await produce_users(queue, page_size)
+        finally:
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+    return rows
+
+def print_report(rows, elapsed):
+    problems = sorted((row for row in rows if row["status"] != "ok"), key=lambda row: (row["status"], row["telegram_id"]))
+    if problems:
+        print(f"{'status':<16}{'telegram_id':>14}  {'wallet':<44}{'wishes':>8}{'on-chain':>10}{'credited':>10}")
+        for row in problems:
+            onchain = row.get("onchain_credits", "?")
+            credited = int(row["credited_raw"]) // CREDIT_UNIT
+            print(f"{row['status']:<16}{row['telegram_id']:>14}  {row['wallet']:<44}"
+                  f"{row['wish_count']:>8}{onchain:>10}{credited:>10}")
+            if row["status"] == "error":
+                print(f"{'':<16}{row['error']}")
+
+    counts = {}
+    for row in rows:
+        counts[row["status"]] = counts.get(row["status"], 0) + 1
+    rate = len(rows) / elapsed if elapsed else 0
+    print(f"\n🧾 Reconciled {len(rows)} wallets in {elapsed:.2f}s ({rate:.1f}/s): {counts}")
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        get_config()
+    except ConfigError as e:
+        raise SystemExit(f"❌ {e}")
+    started = time.perf_counter()
+    try:
+        rows = asyncio.run(reconcile(args.concurrency, args.page_size))
+    finally:
+        shutdown_executor()
+    elapsed = time.perf_counter() - started
+
+    print_report(rows, elapsed)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(sorted(rows, key=lambda row: row["telegram_id"]), f, indent=2)
+        print(f"📝 Report written to {args.output}")
+    return 1 if any(row["status"] != "ok" for row in rows) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
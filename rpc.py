@@ -0,0 +1,158 @@
+import time
+import itertools
+from config import env_int, env_float
+from metrics import timed
+
+RPC_TIMEOUT = env_float("RPC_TIMEOUT", "10")
+# Consecutive transport failures before an endpoint is taken out of rotation
+RPC_FAILURE_THRESHOLD = env_int("RPC_FAILURE_THRESHOLD", "3")
+# How long a tripped endpoint stays out before it gets a trial request
+RPC_COOLDOWN = env_float("RPC_COOLDOWN", "30")
+# Weight of the newest sample in an endpoint's moving-average latency
+RPC_EWMA_ALPHA = 0.3
+
+class RpcError(Exception):
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+class Endpoint:
+    def __init__(self, url):
+        self.url = url
+        self.latency = None
+        self.failures = 0
+        self.open_until = 0.0
+        # Cleared once the endpoint rejects a JSON-RPC batch
+        self.batching = True
+
+    @property
+    def available(self):
+        return time.monotonic() >= self.open_until
+
+    # Lower is better: recent latency, penalized by recent failures
+    def score(self):
+        return (self.latency or 0.0) * (1 + self.failures)
+
+    def record_success(self, elapsed):
+        self.latency = elapsed if self.latency is None else (
+            RPC_EWMA_ALPHA * elapsed + (1 - RPC_EWMA_ALPHA) * self.latency
+        )
+        self.failures = 0
+        self.open_until = 0.0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= RPC_FAILURE_THRESHOLD:
+            self.open_until = time.monotonic() + RPC_COOLDOWN
+            print(f"⚠️ RPC endpoint {self.url} tripped after {self.failures} failures")
+
+# Async JSON-RPC client over a pool of endpoints.
+# Requests go to the best available endpoint (lowest latency, fewest recent
+# failures) and fail over to the next one on transport errors. An endpoint
+# that keeps failing is skipped for RPC_COOLDOWN seconds (circuit breaker).
+# JSON-RPC error responses are the caller's problem, not the endpoint's.
+# Batches only go to endpoints that accept them; the calls in a batch are
+# sent one at a time when none does.
+class RpcClient:
+    def __init__(self, urls, timeout=RPC_TIMEOUT):
+        if not urls:
+            raise ValueError("RpcClient needs at least one endpoint URL")
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.timeout = timeout
+        self._ids = itertools.count(1)
+        self._session = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            import aiohttp
+
+            # One keep-alive connection pool shared by every request
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                connector=aiohttp.TCPConnector(limit_per_host=8, keepalive_timeout=60)
+            )
+        return self._session
+
+    def _ranked(self):
+        available = [e for e in self.endpoints if e.available]
+        if not available:
+            # Everything is tripped; try the one that has been out longest
+            available = [min(self.endpoints, key=lambda e: e.open_until)]
+        return sorted(available, key=lambda e: e.score())
+
+    # Returns the decoded response from the first endpoint that answers. For
+    # a batch, returns None instead when it failed on every endpoint that
+    # still takes batches and some endpoint has been found not to.
+    async def _post(self, payload, operation):
+        session = self._get_session()
+        is_batch = isinstance(payload, list)
+        last_error = None
+        for endpoint in self._ranked():
+            if is_batch and not endpoint.batching:
+                continue
+            started = time.monotonic()
+            rejected = False
+            try:
+                with timed("rpc", operation):
+                    async with session.post(endpoint.url, json=payload) as response:
+                        # A 4xx (other than rate limiting) to a batch means the
+                        # endpoint doesn't take batches, not that it's down
+                        if is_batch and 400 <= response.status < 500 and response.status != 429:
+                            rejected = True
+                        else:
+                            response.raise_for_status()
+                            data = await response.json(content_type=None)
+            except Exception as e:
+                endpoint.record_failure()
+                last_error = e
+                continue
+            # Some providers answer a batch with a single error object instead
+            if is_batch and (rejected or not isinstance(data, list)):
+                endpoint.batching = False
+                print(f"⚠️ RPC endpoint {endpoint.url} rejects batches, sending its calls one by one")
+                continue
+            endpoint.record_success(time.monotonic() - started)
+            return data
+        if is_batch and not all(e.batching for e in self.endpoints):
+            return None
+        raise RpcError(f"All RPC endpoints failed: {last_error}")
+
+    def _request(self, method, params):
+        return {"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": list(params)}
+
+    @staticmethod
+    def _result(response):
+        if "error" in response:
+            error = response["error"] or {}
+            return RpcError(error.get("message", "RPC error"), error.get("code"))
+        return response.get("result")
+
+    async def call(self, method, *params):
+        request = self._request(method, params)
+        result = self._result(await self._post(request, method))
+        if isinstance(result, RpcError):
+            raise result
+        return result
+
+    # Send several calls as one JSON-RPC batch. `calls` is a list of
+    # (method, params) pairs; the results come back in the same order, with
+    # an RpcError in place of any call that failed.
+    async def batch(self, calls):
+        if not calls:
+            return []
+        requests = [self._request(method, params) for method, params in calls]
+        operation = "batch:" + "+".join(sorted({method for method, _ in calls}))
+        responses = await self._post(requests, operation)
+        if responses is None:
+            return [self._result(await self._post(request, request["method"])) for request in requests]
+        by_id = {response.get("id"): response for response in responses}
+        return [
+            self._result(by_id[request["id"]]) if request["id"] in by_id
+            else RpcError(f"No response for {request['method']}")
+            for request in requests
+        ]
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
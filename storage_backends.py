@@ -0,0 +1,747 @@
+import queue
+import atexit
+import sqlite3
+import threading
+from decimal import Decimal
+from contextlib import contextmanager
+from config import get_config
+from metrics import timed_call
+
+# Raw JAXIM amount (18 decimals) worth one wish credit
+CREDIT_UNIT = 10 ** 18
+
+# Table -> columns, in the order export_rows() yields and import_rows() takes them
+TABLES = {
+    "users": ("telegram_id", "wallet", "wish_count", "credited_raw"),
+    "transfers": ("tx_hash", "log_index", "from_wallet", "amount", "block_number"),
+    "watcher_state": ("name", "block_number"),
+}
+# Columns holding raw JAXIM amounts: exported as int, stored as DECIMAL/TEXT
+RAW_COLUMNS = ("credited_raw", "amount")
+
+# Where the bot keeps users, the transfer ledger and watcher checkpoints.
+# db.py is the public interface; it forwards to the configured backend and
+# keeps the leaderboard version on top.
+class StorageBackend:
+    name = None
+
+    # Build the backend from the deployment settings (config.Config)
+    @classmethod
+    def from_config(cls, config):
+        raise NotImplementedError
+
+    # Create the schema (idempotent)
+    def init_db(self):
+        raise NotImplementedError
+
+    # Add a user, or change their wallet without resetting wish_count; credit
+    # whatever the ledger has for the new wallet
+    def add_user(self, telegram_id, wallet):
+        raise NotImplementedError
+
+    def get_wallet(self, telegram_id):
+        raise NotImplementedError
+
+    # Atomically spend one wish credit. Returns the credits left afterwards,
+    # or None if the user isn't registered or has no credit to spend.
+    def spend_credit(self, telegram_id):
+        raise NotImplementedError
+
+    # Credits left (None if the user isn't registered)
+    def get_credit_balance(self, telegram_id):
+        raise NotImplementedError
+
+    def get_wish_count(self, telegram_id):
+        raise NotImplementedError
+
+    # [(telegram_id, wallet, wish_count), ...] by wish_count, highest first
+    def get_leaderboard(self, limit=10):
+        raise NotImplementedError
+
+    # [(telegram_id, wallet), ...]
+    def get_all_users(self):
+        raise NotImplementedError
+
+    # [(telegram_id, wallet, wish_count, credited_raw), ...] after `after_id`
+    def get_users_page(self, after_id=None, limit=500):
+        raise NotImplementedError
+
+    # Record a ledger row and, in the same transaction, credit the user who
+    # registered `from_wallet`. Returns (is_new, telegram_id of the credited
+    # user or None); is_new is False if the transfer was already recorded.
+    def record_transfer(self, tx_hash, log_index, from_wallet, amount, block_number):
+        raise NotImplementedError
+
+    # Set every user's credited_raw to what the ledger has for their wallet
+    # (after a backfill). Returns the number of users.
+    def recompute_credits(self):
+        raise NotImplementedError
+
+    def get_checkpoint(self, name):
+        raise NotImplementedError
+
+    def set_checkpoint(self, name, block_number):
+        raise NotImplementedError
+
+    # Every row of `table` as tuples in TABLES order (for migrations)
+    def export_rows(self, table):
+        raise NotImplementedError
+
+    # Insert or overwrite rows of `table` (for migrations)
+    def import_rows(self, table, rows):
+        raise NotImplementedError
+
+    # A lock only one node sharing this storage can hold (see leader.py)
+    def leader_lock(self, name):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+# === MySQL ===
+
+def get_mysql_connection():
+    # Imported on first connect so importing db stays cheap
+    import mysql.connector
+
+    return mysql.connector.connect(**get_config().mysql_connect_args())
+
+# A pooled connection keeps its prepared statements around between checkouts
+class PooledConnection:
+    def __init__(self, conn):
+        self.conn = conn
+        self.statements = {}
+
+    # Reuse one prepared cursor per SQL string on this connection
+    def prepared(self, sql):
+        cursor = self.statements.get(sql)
+        if cursor is None:
+            cursor = self.conn.cursor(prepared=True)
+            self.statements[sql] = cursor
+        return cursor
+
+    def execute(self, sql, params=()):
+        cursor = self.prepared(sql)
+        cursor.execute(sql, params)
+        return cursor
+
+    def is_healthy(self):
+        try:
+            self.conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def close(self):
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+
+class ConnectionPool:
+    def __init__(self, size=5, timeout=10, connect=get_mysql_connection):
+        self.size = size
+        self.timeout = timeout
+        self._connect = connect
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+
+    # Pooled connections run in autocommit so an idle SELECT never pins an old snapshot
+    def _open(self):
+        conn = self._connect()
+        conn.autocommit = True
+        return PooledConnection(conn)
+
+    def _checkout(self):
+        try:
+            pooled = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    return self._open()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            try:
+                pooled = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                raise TimeoutError("Timed out waiting for a MySQL connection from the pool")
+
+        # Health check on checkout: replace dead connections (and their statements)
+        if not pooled.is_healthy():
+            pooled.close()
+            try:
+                pooled = self._open()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        return pooled
+
+    def _checkin(self, pooled, broken=False):
+        if broken:
+            pooled.close()
+            with self._lock:
+                self._created -= 1
+            return
+        self._idle.put(pooled)
+
+    @contextmanager
+    def connection(self):
+        pooled = self._checkout()
+        try:
+            yield pooled
+        except Exception:
+            try:
+                pooled.conn.rollback()
+                self._checkin(pooled)
+            except Exception:
+                self._checkin(pooled, broken=True)
+            raise
+        else:
+            self._checkin(pooled)
+
+    def close(self):
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            pooled.close()
+            with self._lock:
+                self._created -= 1
+
+# Raw amounts are bound as Decimal: mysql-connector sends a str as a string,
+# which MySQL turns into a DOUBLE in arithmetic and comparisons, rounding
+# anything above 2^53 before it reaches the DECIMAL(65, 0) columns
+class MySQLBackend(StorageBackend):
+    name = "mysql"
+
+    def __init__(self, pool=None):
+        # The pool connects lazily, so building the backend is free
+        self.pool = pool or ConnectionPool()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(ConnectionPool(config.mysql_pool_size, config.mysql_pool_timeout))
+
+    @timed_call("mysql")
+    def init_db(self):
+        import mysql.connector
+
+        with self.pool.connection() as db:
+            c = db.conn.cursor()
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS users (
+                    telegram_id BIGINT PRIMARY KEY,
+                    wallet VARCHAR(100),
+                    wish_count INT DEFAULT 0
+                )
+            ''')
+            # Ledger of JAXIM transfers to the bot wallet, one row per log
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS transfers (
+                    tx_hash CHAR(66) NOT NULL,
+                    log_index INT NOT NULL,
+                    from_wallet VARCHAR(100) NOT NULL,
+                    amount DECIMAL(65, 0) NOT NULL,
+                    block_number BIGINT NOT NULL,
+                    PRIMARY KEY (tx_hash, log_index),
+                    INDEX idx_transfers_from_wallet (from_wallet)
+                )
+            ''')
+            # Last block the transfer watcher fully processed
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS watcher_state (
+                    name VARCHAR(64) PRIMARY KEY,
+                    block_number BIGINT NOT NULL
+                )
+            ''')
+            # Raw JAXIM the ledger credits the user with (pre-ledger history comes
+            # in through backfill_ledger.py); credits = credited_raw DIV CREDIT_UNIT - wish_count
+            try:
+                c.execute("ALTER TABLE users ADD COLUMN credited_raw DECIMAL(65, 0) NOT NULL DEFAULT 0")
+            except mysql.connector.Error as e:
+                if e.errno != 1060:  # ER_DUP_FIELDNAME: column already exists
+                    raise
+            # Lets get_leaderboard read the top N straight off an index, and
+            # record_transfer find a sender's user without a scan
+            for index, columns in (("idx_users_wish_count", "wish_count DESC"), ("idx_users_wallet", "wallet")):
+                try:
+                    c.execute(f"CREATE INDEX {index} ON users ({columns})")
+                except mysql.connector.Error as e:
+                    if e.errno != 1061:  # ER_DUP_KEYNAME: index already exists
+                        raise
+            c.close()
+
+    @timed_call("mysql")
+    def add_user(self, telegram_id, wallet):
+        with self.pool.connection() as db:
+            db.conn.start_transaction()
+            # Add user if not exists
+            db.execute('''
+                INSERT IGNORE INTO users (telegram_id, wallet, wish_count)
+                VALUES (%s, %s, 0)
+            ''', (telegram_id, wallet))
+            # Always update wallet, and credit whatever the ledger has for it
+            db.execute('''
+                UPDATE users SET wallet = %s,
+                    credited_raw = (SELECT COALESCE(SUM(amount), 0) FROM transfers WHERE from_wallet = %s)
+                WHERE telegram_id = %s
+            ''', (wallet, wallet.lower(), telegram_id))
+            db.conn.commit()
+
+    @timed_call("mysql")
+    def get_wallet(self, telegram_id):
+        with self.pool.connection() as db:
+            c = db.execute("SELECT wallet FROM users WHERE telegram_id=%s", (telegram_id,))
+            result = c.fetchone()
+        return result[0] if result else None
+
+    # The check and the spend are one conditional UPDATE on the user's row, so
+    # concurrent spends can't overdraw. The remaining balance comes back
+    # through LAST_INSERT_ID(expr) (the second assignment sees the
+    # already-incremented wish_count), which saves a follow-up SELECT.
+    @timed_call("mysql")
+    def spend_credit(self, telegram_id):
+        with self.pool.connection() as db:
+            c = db.execute('''
+                UPDATE users
+                SET wish_count = wish_count + 1,
+                    credited_raw = credited_raw + 0 * LAST_INSERT_ID(credited_raw DIV %s - wish_count)
+                WHERE telegram_id = %s AND credited_raw DIV %s > wish_count
+            ''', (CREDIT_UNIT, telegram_id, CREDIT_UNIT))
+            if c.rowcount != 1:
+                return None
+            return c.lastrowid
+
+    @timed_call("mysql")
+    def get_credit_balance(self, telegram_id):
+        with self.pool.connection() as db:
+            c = db.execute(
+                "SELECT credited_raw DIV %s - wish_count FROM users WHERE telegram_id=%s",
+                (CREDIT_UNIT, telegram_id)
+            )
+            result = c.fetchone()
+        return int(result[0]) if result else None
+
+    @timed_call("mysql")
+    def get_wish_count(self, telegram_id):
+        with self.pool.connection() as db:
+            c = db.execute("SELECT wish_count FROM users WHERE telegram_id=%s", (telegram_id,))
+            result = c.fetchone()
+        return result[0] if result else 0
+
+    @timed_call("mysql")
+    def get_leaderboard(self, limit=10):
+        with self.pool.connection() as db:
+            c = db.execute("SELECT telegram_id, wallet, wish_count FROM users ORDER BY wish_count DESC LIMIT %s", (limit,))
+            results = c.fetchall()
+        return results
+
+    @timed_call("mysql")
+    def get_all_users(self):
+        with self.pool.connection() as db:
+            c = db.execute('SELECT telegram_id, wallet FROM users')
+            results = c.fetchall()
+        return results
+
+    @timed_call("mysql")
+    def get_users_page(self, after_id=None, limit=500):
+        with self.pool.connection() as db:
+            c = db.execute(
+                "SELECT telegram_id, wallet, wish_count, credited_raw FROM users "
+                "WHERE telegram_id > %s ORDER BY telegram_id LIMIT %s",
+                (after_id if after_id is not None else -2 ** 63, limit)
+            )
+            results = c.fetchall()
+        return [(telegram_id, wallet, wish_count, int(credited_raw)) for telegram_id, wallet, wish_count, credited_raw in results]
+
+    # The sender's user is looked up by wallet in the same transaction (the
+    # wallet column's default collation is case-insensitive), so a wallet
+    # registered a moment ago on another node is credited too. Whose row was
+    # updated comes back through LAST_INSERT_ID(expr), as in spend_credit.
+    @timed_call("mysql")
+    def record_transfer(self, tx_hash, log_index, from_wallet, amount, block_number):
+        telegram_id = None
+        with self.pool.connection() as db:
+            db.conn.start_transaction()
+            c = db.execute('''
+                INSERT IGNORE INTO transfers (tx_hash, log_index, from_wallet, amount, block_number)
+                VALUES (%s, %s, %s, %s, %s)
+            ''', (tx_hash.lower(), log_index, from_wallet.lower(), Decimal(amount), block_number))
+            is_new = c.rowcount == 1
+            if is_new:
+                c = db.execute('''
+                    UPDATE users SET credited_raw = credited_raw + %s + 0 * LAST_INSERT_ID(telegram_id)
+                    WHERE wallet = %s
+                    ORDER BY telegram_id LIMIT 1
+                ''', (Decimal(amount), from_wallet.lower()))
+                if c.rowcount == 1:
+                    telegram_id = c.lastrowid
+            db.conn.commit()
+        return is_new, telegram_id
+
+    @timed_call("mysql")
+    def recompute_credits(self):
+        with self.pool.connection() as db:
+            c = db.conn.cursor()
+            c.execute('''
+                UPDATE users SET credited_raw =
+                    (SELECT COALESCE(SUM(amount), 0) FROM transfers WHERE from_wallet = LOWER(users.wallet))
+            ''')
+            c.execute("SELECT COUNT(*) FROM users")
+            (count,) = c.fetchone()
+            c.close()
+        return count
+
+    @timed_call("mysql")
+    def get_checkpoint(self, name):
+        with self.pool.connection() as db:
+            c = db.execute("SELECT block_number FROM watcher_state WHERE name=%s", (name,))
+            result = c.fetchone()
+        return result[0] if result else None
+
+    @timed_call("mysql")
+    def set_checkpoint(self, name, block_number):
+        with self.pool.connection() as db:
+            db.execute('''
+                INSERT INTO watcher_state (name, block_number) VALUES (%s, %s)
+                ON DUPLICATE KEY UPDATE block_number = VALUES(block_number)
+            ''', (name, block_number))
+
+    def export_rows(self, table):
+        columns = TABLES[table]
+        with self.pool.connection() as db:
+            c = db.conn.cursor()
+            c.execute(f"SELECT {', '.join(columns)} FROM {table}")
+            while True:
+                rows = c.fetchmany(1000)
+                if not rows:
+                    break
+                for row in rows:
+                    yield tuple(int(value) if column in RAW_COLUMNS else value for column, value in zip(columns, row))
+            c.close()
+
+    def import_rows(self, table, rows):
+        columns = TABLES[table]
+        sql = f"REPLACE INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+        count = 0
+        with self.pool.connection() as db:
+            c = db.conn.cursor()
+            batch = []
+            for row in rows:
+                batch.append(tuple(Decimal(value) if column in RAW_COLUMNS else value for column, value in zip(columns, row)))
+                if len(batch) >= 1000:
+                    c.executemany(sql, batch)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                c.executemany(sql, batch)
+                count += len(batch)
+            c.close()
+        return count
+
+    def leader_lock(self, name):
+        from leader import LeaderLock
+
+        return LeaderLock(name)
+
+    def close(self):
+        self.pool.close()
+
+# === SQLite ===
+
+# Embedded single-node storage: one long-lived WAL-mode connection shared
+# by every thread behind a lock, so reads are in-process lookups.
+#
+# Group commit: writes share one open transaction that is committed after
+# `commit_interval` seconds or `commit_batch` writes, whichever comes first
+# (0 commits every write). A crash loses at most that window, and since
+# watcher checkpoints are in the same transaction as the ledger rows they
+# cover, those blocks are simply scanned again.
+# Raw JAXIM amounts overflow SQLite's 64-bit INTEGER, so they are stored as
+# decimal TEXT and the arithmetic on them is done in Python while the write
+# lock is held.
+class SQLiteBackend(StorageBackend):
+    name = "sqlite"
+
+    def __init__(self, path="jaxim.db", commit_interval=0.05, commit_batch=100, busy_timeout=5):
+        self.path = path
+        self.commit_interval = commit_interval
+        self.commit_batch = commit_batch
+        self.busy_timeout = busy_timeout
+        self._conn = None
+        self._lock = threading.RLock()
+        self._pending = 0
+        self._flush_timer = None
+        atexit.register(self.close)
+
+    @classmethod
+    def from_config(cls, config, path=None):
+        return cls(path or config.sqlite_path, config.sqlite_commit_interval,
+                   config.sqlite_commit_batch, config.sqlite_busy_timeout)
+
+    # Call with self._lock held
+    def _connection(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout * 1000)}")
+            self._conn = conn
+        return self._conn
+
+    @contextmanager
+    def _read(self):
+        with self._lock:
+            yield self._connection()
+
+    # Each write joins the open batch transaction inside its own savepoint,
+    # so a failing write rolls back alone
+    @contextmanager
+    def _write(self):
+        with self._lock:
+            conn = self._connection()
+            if not conn.in_transaction:
+                conn.execute("BEGIN IMMEDIATE")
+            conn.execute("SAVEPOINT write")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK TO write")
+                conn.execute("RELEASE write")
+                raise
+            conn.execute("RELEASE write")
+            self._pending += 1
+            if self.commit_interval <= 0 or self._pending >= self.commit_batch:
+                self._commit()
+            elif self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.commit_interval, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    # Call with self._lock held
+    def _commit(self):
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        if self._conn is not None and self._conn.in_transaction:
+            self._conn.execute("COMMIT")
+        self._pending = 0
+
+    # Commit the pending batch now
+    def flush(self):
+        with self._lock:
+            self._commit()
+
+    @timed_call("sqlite")
+    def init_db(self):
+        with self._write() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS users (
+                    telegram_id INTEGER PRIMARY KEY,
+                    wallet TEXT,
+                    wish_count INTEGER NOT NULL DEFAULT 0,
+                    credited_raw TEXT NOT NULL DEFAULT '0'
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS transfers (
+                    tx_hash TEXT NOT NULL,
+                    log_index INTEGER NOT NULL,
+                    from_wallet TEXT NOT NULL,
+                    amount TEXT NOT NULL,
+                    block_number INTEGER NOT NULL,
+                    PRIMARY KEY (tx_hash, log_index)
+                )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_transfers_from_wallet ON transfers (from_wallet)")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS watcher_state (
+                    name TEXT PRIMARY KEY,
+                    block_number INTEGER NOT NULL
+                )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_users_wish_count ON users (wish_count DESC)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_users_wallet ON users (wallet COLLATE NOCASE)")
+        self.flush()
+
+    @timed_call("sqlite")
+    def add_user(self, telegram_id, wallet):
+        with self._write() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO users (telegram_id, wallet, wish_count) VALUES (?, ?, 0)",
+                (telegram_id, wallet)
+            )
+            amounts = conn.execute("SELECT amount FROM transfers WHERE from_wallet = ?", (wallet.lower(),))
+            credited_raw = sum(int(amount) for (amount,) in amounts)
+            conn.execute(
+                "UPDATE users SET wallet = ?, credited_raw = ? WHERE telegram_id = ?",
+                (wallet, str(credited_raw), telegram_id)
+            )
+
+    @timed_call("sqlite")
+    def get_wallet(self, telegram_id):
+        with self._read() as conn:
+            result = conn.execute("SELECT wallet FROM users WHERE telegram_id = ?", (telegram_id,)).fetchone()
+        return result[0] if result else None
+
+    @timed_call("sqlite")
+    def spend_credit(self, telegram_id):
+        with self._write() as conn:
+            row = conn.execute(
+                "SELECT credited_raw, wish_count FROM users WHERE telegram_id = ?", (telegram_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            credits = int(row[0]) // CREDIT_UNIT - row[1]
+            if credits <= 0:
+                return None
+            conn.execute("UPDATE users SET wish_count = wish_count + 1 WHERE telegram_id = ?", (telegram_id,))
+            return credits - 1
+
+    @timed_call("sqlite")
+    def get_credit_balance(self, telegram_id):
+        with self._read() as conn:
+            row = conn.execute(
+                "SELECT credited_raw, wish_count FROM users WHERE telegram_id = ?", (telegram_id,)
+            ).fetchone()
+        return int(row[0]) // CREDIT_UNIT - row[1] if row else None
+
+    @timed_call("sqlite")
+    def get_wish_count(self, telegram_id):
+        with self._read() as conn:
+            result = conn.execute("SELECT wish_count FROM users WHERE telegram_id = ?", (telegram_id,)).fetchone()
+        return result[0] if result else 0
+
+    @timed_call("sqlite")
+    def get_leaderboard(self, limit=10):
+        with self._read() as conn:
+            return conn.execute(
+                "SELECT telegram_id, wallet, wish_count FROM users ORDER BY wish_count DESC LIMIT ?", (limit,)
+            ).fetchall()
+
+    @timed_call("sqlite")
+    def get_all_users(self):
+        with self._read() as conn:
+            return conn.execute("SELECT telegram_id, wallet FROM users").fetchall()
+
+    @timed_call("sqlite")
+    def get_users_page(self, after_id=None, limit=500):
+        with self._read() as conn:
+            results = conn.execute(
+                "SELECT telegram_id, wallet, wish_count, credited_raw FROM users "
+                "WHERE telegram_id > ? ORDER BY telegram_id LIMIT ?",
+                (after_id if after_id is not None else -2 ** 63, limit)
+            ).fetchall()
+        return [(telegram_id, wallet, wish_count, int(credited_raw)) for telegram_id, wallet, wish_count, credited_raw in results]
+
+    @timed_call("sqlite")
+    def record_transfer(self, tx_hash, log_index, from_wallet, amount, block_number):
+        telegram_id = None
+        with self._write() as conn:
+            c = conn.execute('''
+                INSERT OR IGNORE INTO transfers (tx_hash, log_index, from_wallet, amount, block_number)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (tx_hash.lower(), log_index, from_wallet.lower(), str(amount), block_number))
+            is_new = c.rowcount == 1
+            if is_new:
+                row = conn.execute(
+                    "SELECT telegram_id, credited_raw FROM users WHERE wallet = ? COLLATE NOCASE "
+                    "ORDER BY telegram_id LIMIT 1",
+                    (from_wallet,)
+                ).fetchone()
+                if row is not None:
+                    telegram_id = row[0]
+                    conn.execute(
+                        "UPDATE users SET credited_raw = ? WHERE telegram_id = ?",
+                        (str(int(row[1]) + amount), telegram_id)
+                    )
+        return is_new, telegram_id
+
+    @timed_call("sqlite")
+    def recompute_credits(self):
+        with self._write() as conn:
+            totals = {}
+            for from_wallet, amount in conn.execute("SELECT from_wallet, amount FROM transfers"):
+                totals[from_wallet] = totals.get(from_wallet, 0) + int(amount)
+            users = conn.execute("SELECT telegram_id, wallet FROM users").fetchall()
+            for telegram_id, wallet in users:
+                conn.execute(
+                    "UPDATE users SET credited_raw = ? WHERE telegram_id = ?",
+                    (str(totals.get((wallet or "").lower(), 0)), telegram_id)
+                )
+        self.flush()
+        return len(users)
+
+    @timed_call("sqlite")
+    def get_checkpoint(self, name):
+        with self._read() as conn:
+            result = conn.execute("SELECT block_number FROM watcher_state WHERE name = ?", (name,)).fetchone()
+        return result[0] if result else None
+
+    @timed_call("sqlite")
+    def set_checkpoint(self, name, block_number):
+        with self._write() as conn:
+            conn.execute('''
+                INSERT INTO watcher_state (name, block_number) VALUES (?, ?)
+                ON CONFLICT (name) DO UPDATE SET block_number = excluded.block_number
+            ''', (name, block_number))
+
+    def export_rows(self, table):
+        columns = TABLES[table]
+        with self._read() as conn:
+            rows = conn.execute(f"SELECT {', '.join(columns)} FROM {table}").fetchall()
+        for row in rows:
+            yield tuple(int(value) if column in RAW_COLUMNS else value for column, value in zip(columns, row))
+
+    def import_rows(self, table, rows):
+        columns = TABLES[table]
+        sql = f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})"
+        count = 0
+        with self._write() as conn:
+            for row in rows:
+                conn.execute(sql, tuple(
+                    str(value) if column in RAW_COLUMNS else value for column, value in zip(columns, row)
+                ))
+                count += 1
+        self.flush()
+        return count
+
+    def leader_lock(self, name):
+        from leader import FileLeaderLock
+
+        return FileLeaderLock(name, f"{self.path}.{name}.lock")
+
+    def close(self):
+        with self._lock:
+            self._commit()
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+BACKENDS = {
+    MySQLBackend.name: MySQLBackend,
+    SQLiteBackend.name: SQLiteBackend,
+}
+
+_storage = None
+_storage_lock = threading.Lock()
+
+# The configured backend (STORAGE_BACKEND, default "mysql"), built once and
+# shared; an unknown backend is reported by get_config() as a ConfigError
+def get_storage():
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                config = get_config()
+                _storage = BACKENDS[config.storage_backend].from_config(config)
+    return _storage
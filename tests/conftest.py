@@ -0,0 +1,48 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage_backends import TABLES, SQLiteBackend, MySQLBackend, ConnectionPool
+
+# MySQL tests run against the database in MYSQL_TEST_DB (its tables are
+# dropped and recreated), and are skipped when it isn't set
+MYSQL_TEST_DB = os.getenv("MYSQL_TEST_DB")
+
+def connect_mysql_test():
+    import mysql.connector
+
+    return mysql.connector.connect(
+        host=os.getenv("MYSQL_TEST_HOST", "127.0.0.1"),
+        port=int(os.getenv("MYSQL_TEST_PORT", "3306")),
+        database=MYSQL_TEST_DB,
+        user=os.getenv("MYSQL_TEST_USER", "root"),
+        password=os.getenv("MYSQL_TEST_PASSWORD", "")
+    )
+
+def make_sqlite(tmp_path):
+    # commit_interval=0 commits every write, like the MySQL backend
+    backend = SQLiteBackend(str(tmp_path / "test.db"), commit_interval=0)
+    backend.init_db()
+    return backend
+
+def make_mysql():
+    if not MYSQL_TEST_DB:
+        pytest.skip("MYSQL_TEST_DB is not set")
+    pytest.importorskip("mysql.connector")
+    backend = MySQLBackend(ConnectionPool(size=2, connect=connect_mysql_test))
+    with backend.pool.connection() as db:
+        c = db.conn.cursor()
+        for table in TABLES:
+            c.execute(f"DROP TABLE IF EXISTS {table}")
+        c.close()
+    backend.init_db()
+    return backend
+
+@pytest.fixture(params=["sqlite", "mysql"])
+def storage(request, tmp_path):
+    backend = make_sqlite(tmp_path) if request.param == "sqlite" else make_mysql()
+    yield backend
+    backend.close()
@@ -0,0 +1,36 @@
+import pytest
+
+from config import Config, ConfigError
+
+ENV = {
+    "BOT_TOKEN": "123:abc",
+    "BOT_WALLET": "0x" + "b0" * 20,
+    "BASE_RPC": "http://rpc-a, http://rpc-b",
+    "COVALENT_API_KEY": "key",
+    "STORAGE_BACKEND": "sqlite",
+}
+
+def test_defaults():
+    config = Config(ENV).validate()
+    assert config.rpc_urls == ["http://rpc-a", "http://rpc-b"]
+    assert config.watcher_max_block_range == 2000
+    assert config.watcher_start_block is None
+    assert config.watcher_enabled
+
+def test_reports_every_bad_setting():
+    env = dict(ENV, STORAGE_BACKEND="postgres", WATCHER_MAX_BLOCK_RANGE="2k",
+               SQLITE_COMMIT_INTERVAL="soon", WATCHER_START_BLOCK="abc")
+    with pytest.raises(ConfigError) as e:
+        Config(env).validate()
+    message = str(e.value)
+    for name in ("STORAGE_BACKEND", "WATCHER_MAX_BLOCK_RANGE", "SQLITE_COMMIT_INTERVAL", "WATCHER_START_BLOCK"):
+        assert name in message
+
+def test_mysql_settings():
+    env = dict(ENV, STORAGE_BACKEND="mysql", MYSQL_HOST="db", MYSQL_PORT="3307", MYSQL_DB="jaxim",
+               MYSQL_USER="bot", MYSQL_PASSWORD="secret", MYSQL_POOL_SIZE="8")
+    config = Config(env).validate()
+    assert config.mysql_pool_size == 8
+    assert config.mysql_connect_args() == {
+        "host": "db", "port": 3307, "database": "jaxim", "user": "bot", "password": "secret",
+    }
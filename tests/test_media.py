@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("telegram")
+
+from telegram.error import BadRequest
+
+from media import MediaRegistry
+
+@pytest.fixture
+def registry(tmp_path):
+    asset = tmp_path / "welcome.gif"
+    asset.write_bytes(b"GIF89a")
+    registry = MediaRegistry(str(tmp_path / "media_cache.json"))
+    registry.remember(str(asset), "cached-id")
+    return registry, str(asset)
+
+def send_with(error):
+    sent = []
+
+    async def send(media):
+        sent.append(media if isinstance(media, str) else "upload")
+        if isinstance(media, str):
+            raise error
+        return "uploaded-id"
+
+    return sent, send
+
+def test_rejected_file_id_is_reuploaded(registry):
+    registry, asset = registry
+    sent, send = send_with(BadRequest("Wrong file identifier/http url specified"))
+    assert asyncio.run(registry.send(asset, send, lambda message: message)) == "uploaded-id"
+    assert sent == ["cached-id", "upload"]
+    assert registry.get_file_id(asset) == "uploaded-id"
+
+def test_other_bad_request_keeps_file_id(registry):
+    registry, asset = registry
+    sent, send = send_with(BadRequest("Chat not found"))
+    with pytest.raises(BadRequest):
+        asyncio.run(registry.send(asset, send, lambda message: message))
+    assert sent == ["cached-id"]
+    assert registry.get_file_id(asset) == "cached-id"
@@ -0,0 +1,53 @@
+import os
+
+from quote_store import QuoteStore
+
+QUOTE = "Believe in the sparkle of tomorrow, because the lamp of Jaxim always glows for you!"
+
+def test_add_and_contains(tmp_path):
+    store = QuoteStore(str(tmp_path / "used.txt"))
+    assert not store.contains(QUOTE)
+    assert store.add(QUOTE)
+    assert store.contains(QUOTE)
+    # Same text after normalization, and a near-duplicate
+    assert store.contains("“" + QUOTE.upper() + "” ✨")
+    assert store.contains(QUOTE.replace("always", "truly always"))
+    assert not store.add(QUOTE)
+    assert len(store) == 1
+
+def test_picks_up_lines_from_other_writers(tmp_path):
+    path = tmp_path / "used.txt"
+    store = QuoteStore(str(path))
+    other = QuoteStore(str(path))
+    assert other.add(QUOTE)
+    assert store.contains(QUOTE)
+    # A partial line is left until it's complete
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("Half a quote about wishes")
+    assert not store.contains("Half a quote about wishes")
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(" coming true\n")
+    assert store.contains("Half a quote about wishes coming true")
+    assert len(store) == 2
+
+def test_unchanged_file_is_not_reread(tmp_path, monkeypatch):
+    path = tmp_path / "used.txt"
+    store = QuoteStore(str(path))
+    store.add(QUOTE)
+    reads = []
+    real_open = open
+    monkeypatch.setattr("builtins.open", lambda *args, **kwargs: reads.append(args) or real_open(*args, **kwargs))
+    assert store.contains(QUOTE)
+    assert not store.contains("Something else entirely, about the moon and stars")
+    assert reads == []
+
+def test_replaced_file_is_reindexed(tmp_path):
+    path = tmp_path / "used.txt"
+    store = QuoteStore(str(path))
+    store.add(QUOTE)
+    replacement = tmp_path / "new.txt"
+    replacement.write_text("A brand new wish for a brand new day, sparkling bright\n", encoding="utf-8")
+    os.replace(replacement, path)
+    assert not store.contains(QUOTE)
+    assert store.contains("A brand new wish for a brand new day, sparkling bright")
+    assert len(store) == 1
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from rpc import RpcClient, RpcError
+
+class StubResponse:
+    def __init__(self, status, body):
+        self.status = status
+        self.body = body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise RuntimeError(f"HTTP {self.status}")
+
+    async def json(self, content_type=None):
+        return self.body
+
+# Stands in for the aiohttp session: answers single calls with
+# "<method>@<url>", and batches the way the endpoint's `batch` mode says
+class StubSession:
+    def __init__(self, batch_modes):
+        self.batch_modes = batch_modes
+        self.posts = []
+        self.closed = False
+
+    def post(self, url, json):
+        self.posts.append((url, json))
+        if not isinstance(json, list):
+            if json["method"] == "fail":
+                return StubResponse(200, {"jsonrpc": "2.0", "id": json["id"], "error": {"code": -1, "message": "nope"}})
+            return StubResponse(200, {"jsonrpc": "2.0", "id": json["id"], "result": f"{json['method']}@{url}"})
+        mode = self.batch_modes.get(url, "ok")
+        if mode == "http":
+            return StubResponse(400, None)
+        if mode == "error":
+            return StubResponse(200, {"jsonrpc": "2.0", "id": None,
+                                      "error": {"code": -32600, "message": "batch requests are not supported"}})
+        if mode == "down":
+            return StubResponse(503, None)
+        return StubResponse(200, [
+            {"jsonrpc": "2.0", "id": request["id"], "result": f"{request['method']}@{url}"} for request in json
+        ])
+
+    async def close(self):
+        self.closed = True
+
+def make_client(batch_modes, urls=("http://a",)):
+    client = RpcClient(list(urls))
+    client._session = StubSession(batch_modes)
+    return client
+
+CALLS = [("eth_blockNumber", []), ("eth_getLogs", [{}])]
+
+def test_batch():
+    client = make_client({})
+    assert asyncio.run(client.batch(CALLS)) == ["eth_blockNumber@http://a", "eth_getLogs@http://a"]
+    assert len(client._session.posts) == 1
+
+def run_rejected(mode):
+    client = make_client({"http://a": mode})
+    results = asyncio.run(client.batch(CALLS + [("fail", [])]))
+    assert results[:2] == ["eth_blockNumber@http://a", "eth_getLogs@http://a"]
+    assert isinstance(results[2], RpcError)
+    endpoint = client.endpoints[0]
+    assert not endpoint.batching
+    # A rejected batch isn't a transport failure
+    assert endpoint.failures == 0 and endpoint.available
+    # Remembered: the next batch goes straight to single calls
+    posts = len(client._session.posts)
+    asyncio.run(client.batch(CALLS))
+    assert [type(body) for _, body in client._session.posts[posts:]] == [dict, dict]
+
+def test_batch_rejected_with_http_error():
+    run_rejected("http")
+
+def test_batch_rejected_with_json_error():
+    run_rejected("error")
+
+def test_batch_prefers_endpoints_that_take_batches():
+    client = make_client({"http://a": "error"}, urls=("http://a", "http://b"))
+    client.endpoints[1].latency = 1.0
+    assert asyncio.run(client.batch(CALLS)) == ["eth_blockNumber@http://b", "eth_getLogs@http://b"]
+    assert [e.batching for e in client.endpoints] == [False, True]
+    # Single calls still use the best endpoint
+    assert asyncio.run(client.call("eth_blockNumber")) == "eth_blockNumber@http://a"
+
+def test_batch_server_error_is_a_failure():
+    client = make_client({"http://a": "down"})
+    with pytest.raises(RpcError):
+        asyncio.run(client.batch(CALLS))
+    assert client.endpoints[0].batching
+    assert client.endpoints[0].failures == 1
@@ -0,0 +1,104 @@
+from storage_backends import CREDIT_UNIT
+
+WALLET = "0xAbCdEf0123456789aBcDeF0123456789AbCdEf01"
+OTHER_WALLET = "0x1111111111111111111111111111111111111111"
+# Above 2^53, so a value that went through a DOUBLE would be rounded
+BIG_ID = 7_000_000_001
+
+def tx(n):
+    return "0x" + format(n, "064x")
+
+def test_spend_credit_unknown_user(storage):
+    assert storage.spend_credit(1) is None
+    assert storage.get_credit_balance(1) is None
+
+def test_spend_credit_without_credits(storage):
+    storage.add_user(1, WALLET)
+    assert storage.spend_credit(1) is None
+    assert storage.get_wish_count(1) == 0
+    assert storage.get_credit_balance(1) == 0
+
+def test_spend_credit_returns_remaining(storage):
+    storage.add_user(BIG_ID, WALLET)
+    storage.record_transfer(tx(1), 0, WALLET, 2 * CREDIT_UNIT, 100)
+    assert storage.get_credit_balance(BIG_ID) == 2
+    assert storage.spend_credit(BIG_ID) == 1
+    assert storage.spend_credit(BIG_ID) == 0
+    assert storage.spend_credit(BIG_ID) is None
+    assert storage.get_wish_count(BIG_ID) == 2
+    assert storage.get_credit_balance(BIG_ID) == 0
+
+def test_spend_credit_ignores_fractions(storage):
+    storage.add_user(1, WALLET)
+    storage.record_transfer(tx(1), 0, WALLET, CREDIT_UNIT - 1, 100)
+    assert storage.spend_credit(1) is None
+    storage.record_transfer(tx(2), 0, WALLET, 1, 101)
+    assert storage.spend_credit(1) == 0
+
+def test_record_transfer_credits_sender(storage):
+    storage.add_user(BIG_ID, WALLET)
+    assert storage.record_transfer(tx(1), 3, WALLET, CREDIT_UNIT, 100) == (True, BIG_ID)
+    assert storage.get_credit_balance(BIG_ID) == 1
+
+def test_record_transfer_is_idempotent(storage):
+    storage.add_user(1, WALLET)
+    assert storage.record_transfer(tx(1), 0, WALLET, CREDIT_UNIT, 100) == (True, 1)
+    assert storage.record_transfer(tx(1).upper().replace("0X", "0x"), 0, WALLET, CREDIT_UNIT, 100) == (False, None)
+    # Same transaction, another log: a separate transfer
+    assert storage.record_transfer(tx(1), 1, WALLET, CREDIT_UNIT, 100) == (True, 1)
+    assert storage.get_credit_balance(1) == 2
+
+def test_record_transfer_matches_wallet_case_insensitively(storage):
+    storage.add_user(1, WALLET)
+    assert storage.record_transfer(tx(1), 0, WALLET.lower(), CREDIT_UNIT, 100) == (True, 1)
+    assert storage.record_transfer(tx(2), 0, WALLET.upper().replace("0X", "0x"), CREDIT_UNIT, 100) == (True, 1)
+    assert storage.get_credit_balance(1) == 2
+
+def test_record_transfer_from_unknown_wallet(storage):
+    storage.add_user(1, WALLET)
+    assert storage.record_transfer(tx(1), 0, OTHER_WALLET, CREDIT_UNIT, 100) == (True, None)
+    assert storage.get_credit_balance(1) == 0
+
+def test_record_transfer_credits_one_user_per_wallet(storage):
+    storage.add_user(BIG_ID, WALLET)
+    storage.add_user(BIG_ID + 1, WALLET)
+    assert storage.record_transfer(tx(1), 0, WALLET, CREDIT_UNIT, 100) == (True, BIG_ID)
+    assert storage.get_credit_balance(BIG_ID) == 1
+    assert storage.get_credit_balance(BIG_ID + 1) == 0
+
+def test_record_transfer_keeps_large_amounts_exact(storage):
+    storage.add_user(1, WALLET)
+    amount = 3 * CREDIT_UNIT + 1
+    storage.record_transfer(tx(1), 0, WALLET, amount, 100)
+    storage.record_transfer(tx(2), 0, WALLET, CREDIT_UNIT - 1, 101)
+    assert storage.get_users_page() == [(1, WALLET, 0, 4 * CREDIT_UNIT)]
+    assert storage.get_credit_balance(1) == 4
+
+def test_add_user_credits_earlier_transfers(storage):
+    storage.record_transfer(tx(1), 0, WALLET, 2 * CREDIT_UNIT, 100)
+    storage.add_user(1, WALLET.lower())
+    assert storage.get_credit_balance(1) == 2
+
+def test_add_user_wallet_change_keeps_wishes(storage):
+    storage.add_user(1, WALLET)
+    storage.record_transfer(tx(1), 0, WALLET, 2 * CREDIT_UNIT, 100)
+    storage.record_transfer(tx(2), 0, OTHER_WALLET, 5 * CREDIT_UNIT, 101)
+    storage.spend_credit(1)
+    storage.add_user(1, OTHER_WALLET)
+    assert storage.get_wallet(1) == OTHER_WALLET
+    assert storage.get_wish_count(1) == 1
+    assert storage.get_credit_balance(1) == 4
+
+def test_recompute_credits_syncs_with_ledger(storage):
+    storage.add_user(1, WALLET)
+    storage.add_user(2, OTHER_WALLET)
+    # Backfilled history for users who registered before the ledger existed
+    storage.record_transfer(tx(1), 0, WALLET, CREDIT_UNIT, 100)
+    storage.record_transfer(tx(2), 0, WALLET, CREDIT_UNIT, 101)
+    storage.record_transfer(tx(3), 0, OTHER_WALLET, 3 * CREDIT_UNIT, 102)
+    assert storage.recompute_credits() == 2
+    assert storage.get_credit_balance(1) == 2
+    assert storage.get_credit_balance(2) == 3
+    # Running it again changes nothing
+    assert storage.recompute_credits() == 2
+    assert storage.get_credit_balance(1) == 2
@@ -0,0 +1,66 @@
+import asyncio
+from telegram.ext import BaseUpdateProcessor
+from config import env_int
+
+# Updates handled at once across all users (1 = the old sequential behaviour)
+UPDATE_CONCURRENCY = env_int("UPDATE_CONCURRENCY", "32")
+# Updates accepted at once, counting those waiting behind an earlier update
+# from the same user; further updates wait in the Application's queue
+UPDATE_BACKLOG = env_int("UPDATE_BACKLOG", "1024")
+
+# Processes updates concurrently, but one at a time per user: a user's
+# updates queue on that user's lock in arrival order, so their /register,
+# /balance and /wish never interleave while other users run in parallel.
+# A lock is dropped as soon as nothing holds or waits on it.
+#
+# The base class's limit only bounds how many updates are accepted; the
+# handler slots are a second semaphore taken once it's the user's turn, so
+# one user with a backlog can't tie up slots other users could run in.
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    def __init__(self, max_concurrent_updates=UPDATE_CONCURRENCY, max_backlog=UPDATE_BACKLOG):
+        super().__init__(max(max_backlog, max_concurrent_updates) if max_concurrent_updates > 1 else 1)
+        self.max_running_updates = max_concurrent_updates
+        self._slots = asyncio.Semaphore(max_concurrent_updates)
+        # key -> [lock, updates holding or waiting on it]
+        self._locks = {}
+
+    @staticmethod
+    def _key(update):
+        user = getattr(update, "effective_user", None)
+        if user is not None:
+            return user.id
+        chat = getattr(update, "effective_chat", None)
+        if chat is not None:
+            return ("chat", chat.id)
+        return None
+
+    async def _run(self, coroutine):
+        async with self._slots:
+            await coroutine
+
+    async def do_process_update(self, update, coroutine):
+        key = self._key(update)
+        if key is None:
+            await self._run(coroutine)
+            return
+
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await self._run(coroutine)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+    def active_users(self):
+        return len(self._locks)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass